@@ -0,0 +1,22 @@
+"""Пользователь сессии из кеша вместо запроса к БД на каждой странице."""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_KEY = 'auth:user:%s'
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = USER_KEY % user_id
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+        return user
+
+
+def forget_user(sender, instance, **kwargs):
+    """Любое изменение пользователя, включая пароль, сбрасывает кеш."""
+    cache.delete(USER_KEY % instance.pk)
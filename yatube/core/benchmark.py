@@ -0,0 +1,42 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database(use_current=False):
+    """Временная БД со схемой проекта, чтобы замеры не портили рабочую."""
+    if use_current:
+        yield
+        return
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(func, repeat=20):
+    """Медиана и p95 времени вызова func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+    }
+
+
+def percentile(ordered, rank):
+    """Перцентиль по отсортированному списку методом ближайшего ранга."""
+    if not ordered:
+        return 0.0
+    index = max(0, -(-len(ordered) * rank // 100) - 1)
+    return ordered[min(index, len(ordered) - 1)]
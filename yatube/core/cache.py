@@ -0,0 +1,317 @@
+"""Двухуровневый кеш: LRU в памяти процесса (L1) перед общим кешем (L2).
+
+Чтение сначала смотрит в L1, при промахе идёт в L2 и запоминает значение
+в L1. Любая запись уходит в L2 и дописывает изменённые ключи в журнал
+инвалидаций; версия журнала растёт на каждую запись. Журнал живёт в
+отдельном кеше LOG_CACHE, чтобы его записи не вытесняли данные, а каждая
+запись журнала хранится LOG_TIMEOUT секунд. Раз в SYNC_INTERVAL секунд
+процесс сверяет свою версию с общей и выкидывает из L1 чужие изменения,
+а если отстал больше чем на LOG_SIZE версий или записи уже истекли —
+очищает L1 целиком. Значение живёт в L1 не дольше L1_TIMEOUT секунд: это
+предел устаревания, если две записи в журнал столкнулись на неатомарном
+кеше.
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+LOG_VERSION_KEY = 'tiered:log'
+LOG_ENTRY_KEY = 'tiered:log:%d'
+TIERS = ('l1', 'l2')
+_missing = object()
+
+
+# Экземпляры бэкенда создаются на каждый поток, а L1 общий на процесс:
+# как в LocMemCache, состояние хранится по LOCATION.
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """L1: LRU в памяти процесса, ограниченный числом записей и байтами."""
+
+    def __init__(self, max_entries, max_bytes, timeout):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+        # Версия журнала, до которой L1 согласован с L2.
+        self.version = None
+        self.synced_at = 0.0
+        self.counts = {
+            (tier, result): 0 for tier in TIERS for result in ('hit', 'miss')
+        }
+        self.counts['evictions'] = 0
+        self.counts['invalidations'] = 0
+
+    def count(self, key, amount=1):
+        self.counts[key] += amount
+
+    def get(self, made_key):
+        with self.lock:
+            entry = self.entries.get(made_key)
+            if entry is not None and entry[1] <= time.monotonic():
+                self._drop(made_key)
+                entry = None
+            if entry is None:
+                self.count(('l1', 'miss'))
+                return _missing
+            self.entries.move_to_end(made_key)
+            self.count(('l1', 'hit'))
+        return pickle.loads(entry[0])
+
+    def set(self, made_key, value, timeout=DEFAULT_TIMEOUT):
+        lifetime = self.timeout
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            self.forget([made_key])
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        size = len(data) + len(made_key)
+        with self.lock:
+            self._drop(made_key)
+            if size > self.max_bytes:
+                return
+            self.entries[made_key] = (data, time.monotonic() + lifetime, size)
+            self.bytes += size
+            while (
+                len(self.entries) > self.max_entries
+                or self.bytes > self.max_bytes
+            ):
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.bytes -= evicted
+                self.count('evictions')
+
+    def _drop(self, made_key):
+        entry = self.entries.pop(made_key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def forget(self, made_keys):
+        with self.lock:
+            for made_key in made_keys:
+                self._drop(made_key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            report = {'l1_entries': len(self.entries), 'l1_bytes': self.bytes}
+        for tier in TIERS:
+            hits = self.counts[(tier, 'hit')]
+            misses = self.counts[(tier, 'miss')]
+            report[tier] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 4)
+                if hits + misses else 0.0,
+            }
+        report['evictions'] = self.counts['evictions']
+        report['invalidations'] = self.counts['invalidations']
+        return report
+
+
+def tier_stats():
+    """Статистика L1 всех двухуровневых кешей процесса по LOCATION."""
+    with _tiers_lock:
+        tiers = dict(_tiers)
+    return {location: tier.stats() for location, tier in tiers.items()}
+
+
+class TieredCache(BaseCache):
+    """LOCATION — алиас общего кеша L2 из CACHES.
+
+    LOG_CACHE — алиас кеша для журнала инвалидаций, по умолчанию тот же
+    L2. Отдельный кеш должен вмещать LOG_SIZE + 1 записей.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self._log_alias = options.get('LOG_CACHE', location)
+        self._sync_interval = options.get('SYNC_INTERVAL', 0.5)
+        self._log_size = options.get('LOG_SIZE', 1000)
+        self._log_timeout = options.get('LOG_TIMEOUT', 60)
+        with _tiers_lock:
+            if location not in _tiers:
+                _tiers[location] = LocalTier(
+                    self._max_entries,
+                    options.get('MAX_BYTES', 32 * 1024 * 1024),
+                    options.get('L1_TIMEOUT', 10),
+                )
+            self._l1 = _tiers[location]
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    @property
+    def _log(self):
+        return caches[self._log_alias]
+
+    def _token(self):
+        # Свои записи в журнале при синхронизации пропускаются.
+        return '%d:%s' % (os.getpid(), self._l2_alias)
+
+    # Журнал инвалидаций
+
+    def _publish(self, made_keys):
+        log = self._log
+        log.add(LOG_VERSION_KEY, 0, None)
+        try:
+            version = log.incr(LOG_VERSION_KEY)
+        except ValueError:
+            # Ключ журнала вытеснили или очистили: начинаем заново.
+            log.set(LOG_VERSION_KEY, 1, None)
+            version = 1
+        log.set(
+            LOG_ENTRY_KEY % version,
+            (self._token(), made_keys),
+            self._log_timeout,
+        )
+        # Журнал не длиннее LOG_SIZE записей и без истечения срока.
+        log.delete(LOG_ENTRY_KEY % (version - self._log_size))
+
+    def _sync(self):
+        l1 = self._l1
+        now = time.monotonic()
+        if now - l1.synced_at < self._sync_interval:
+            return
+        l1.synced_at = now
+        log = self._log
+        shared = log.get(LOG_VERSION_KEY, 0)
+        local, l1.version = l1.version, shared
+        if local is None or shared == local:
+            return
+        if shared < local or shared - local > self._log_size:
+            l1.clear()
+            return
+        wanted = [LOG_ENTRY_KEY % n for n in range(local + 1, shared + 1)]
+        entries = log.get_many(wanted)
+        if len(entries) < len(wanted):
+            # Запись журнала ещё не дописана, истекла или вытеснена.
+            l1.clear()
+            return
+        token = self._token()
+        stale = [
+            made_key
+            for writer, made_keys in entries.values()
+            if writer != token
+            for made_key in made_keys
+        ]
+        l1.count('invalidations', len(stale))
+        l1.forget(stale)
+
+    def _changed(self, made_keys):
+        self._publish(made_keys)
+        self._l1.forget(made_keys)
+
+    # API кеша
+
+    def _key(self, key, version):
+        made_key = self.make_key(key, version=version)
+        self.validate_key(made_key)
+        return made_key
+
+    def get(self, key, default=None, version=None):
+        self._sync()
+        made_key = self._key(key, version)
+        value = self._l1.get(made_key)
+        if value is not _missing:
+            return value
+        value = self._l2.get(key, _missing, version=version)
+        if value is _missing:
+            self._l1.count(('l2', 'miss'))
+            return default
+        self._l1.count(('l2', 'hit'))
+        self._l1.set(made_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found, missing = {}, []
+        for key in keys:
+            value = self._l1.get(self._key(key, version))
+            if value is _missing:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            loaded = self._l2.get_many(missing, version=version)
+            self._l1.count(('l2', 'hit'), len(loaded))
+            self._l1.count(('l2', 'miss'), len(missing) - len(loaded))
+            for key, value in loaded.items():
+                self._l1.set(self._key(key, version), value)
+            found.update(loaded)
+        return found
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version=version) is not _missing
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._sync()
+        made_key = self._key(key, version)
+        self._l2.set(key, value, timeout, version=version)
+        self._changed([made_key])
+        self._l1.set(made_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._sync()
+        made_key = self._key(key, version)
+        added = self._l2.add(key, value, timeout, version=version)
+        if added:
+            self._changed([made_key])
+            self._l1.set(made_key, value, timeout)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._sync()
+        failed = self._l2.set_many(data, timeout, version=version)
+        made_keys = {key: self._key(key, version) for key in data}
+        self._changed(list(made_keys.values()))
+        for key, value in data.items():
+            if key not in failed:
+                self._l1.set(made_keys[key], value, timeout)
+        return failed
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._sync()
+        value = self._l2.incr(key, delta, version=version)
+        # Счётчики меняются часто: в L1 их не держим.
+        self._changed([self._key(key, version)])
+        return value
+
+    def delete(self, key, version=None):
+        self._sync()
+        self._l2.delete(key, version=version)
+        self._changed([self._key(key, version)])
+
+    def delete_many(self, keys, version=None):
+        self._sync()
+        keys = list(keys)
+        self._l2.delete_many(keys, version=version)
+        self._changed([self._key(key, version) for key in keys])
+
+    def clear(self):
+        # Вместе с L2 очищается журнал; другие процессы увидят, что его
+        # версия уменьшилась, и очистят свой L1.
+        self._l2.clear()
+        if self._log_alias != self._l2_alias:
+            self._log.clear()
+        self._l1.clear()
+        self._l1.version = 0
@@ -0,0 +1,36 @@
+"""Настройка соединений с БД.
+
+Новое соединение SQLite получает PRAGMA из SQLITE_PRAGMAS: WAL позволяет
+читать во время записи, а busy_timeout заставляет писателей ждать
+блокировку, а не падать сразу. Постоянные соединения (CONN_MAX_AGE)
+перед каждым запросом проверяются и закрываются, если оборвались.
+"""
+from django.conf import settings
+from django.db import connections
+
+
+def pragma_statements(pragmas):
+    return [
+        'PRAGMA %s = %s' % (name, value) for name, value in pragmas.items()
+    ]
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+            cursor.execute(statement)
+
+
+def check_connections(**kwargs):
+    """Закрывает неработающие постоянные соединения до начала запроса."""
+    if not settings.DATABASE_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
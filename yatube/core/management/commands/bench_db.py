@@ -0,0 +1,151 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.benchmark import percentile
+from core.db import pragma_statements
+
+SCHEMA = (
+    'CREATE TABLE post ('
+    ' id INTEGER PRIMARY KEY,'
+    ' author_id INTEGER NOT NULL,'
+    ' text TEXT NOT NULL,'
+    ' pub_date REAL NOT NULL)',
+    'CREATE INDEX post_author ON post (author_id, pub_date)',
+    'CREATE INDEX post_date ON post (pub_date)',
+)
+READ = (
+    'SELECT id, author_id, text, pub_date FROM post '
+    'WHERE author_id = ? ORDER BY pub_date DESC LIMIT 10'
+)
+WRITE = 'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)'
+AUTHORS = 1000
+
+# Профиль: PRAGMA и живёт ли соединение дольше одной операции.
+PROFILES = {
+    'baseline': ({}, False),
+    'tuned': (None, True),
+}
+
+
+def connect(path, pragmas):
+    database = sqlite3.connect(path, timeout=5)
+    for statement in pragma_statements(pragmas):
+        database.execute(statement)
+    return database
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite на конкурентных чтениях '
+        'и записях: настройки по умолчанию и новое соединение на каждую '
+        'операцию против SQLITE_PRAGMAS и постоянных соединений.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        report = {}
+        for name, (pragmas, persistent) in PROFILES.items():
+            if pragmas is None:
+                pragmas = settings.SQLITE_PRAGMAS
+            directory = tempfile.mkdtemp()
+            path = os.path.join(directory, 'bench.sqlite3')
+            try:
+                self.fill(path, options['rows'])
+                report[name] = self.run(path, pragmas, persistent, options)
+            finally:
+                for entry in os.scandir(directory):
+                    os.remove(entry.path)
+                os.rmdir(directory)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def fill(self, path, rows):
+        database = sqlite3.connect(path)
+        for statement in SCHEMA:
+            database.execute(statement)
+        rng = random.Random(1)
+        now = time.time()
+        database.executemany(
+            WRITE,
+            (
+                (rng.randrange(AUTHORS), f'Пост {number}', now - number)
+                for number in range(rows)
+            ),
+        )
+        database.commit()
+        database.close()
+
+    def run(self, path, pragmas, persistent, options):
+        deadline = time.perf_counter() + options['seconds']
+        results = {'read': [], 'write': []}
+        self.errors = 0
+        workers = [('read', seed) for seed in range(options['readers'])]
+        workers += [('write', -seed - 1) for seed in range(options['writers'])]
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(path, pragmas, persistent, kind, seed, deadline,
+                      results[kind]),
+            )
+            for kind, seed in workers
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - started
+        report = {'pragmas': pragmas, 'persistent': persistent}
+        for kind, timings in results.items():
+            timings.sort()
+            report[kind] = {
+                'ops': len(timings),
+                'ops_per_second': round(len(timings) / wall, 1),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+            }
+        report['errors'] = self.errors
+        return report
+
+    def worker(self, path, pragmas, persistent, kind, seed, deadline,
+               results):
+        """Операции до deadline; без persistent — соединение на каждую."""
+        rng = random.Random(seed)
+        timings = []
+        database = connect(path, pragmas) if persistent else None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            current = database or connect(path, pragmas)
+            try:
+                self.operation(current, kind, rng)
+            except sqlite3.OperationalError:
+                self.errors += 1
+                continue
+            finally:
+                if database is None:
+                    current.close()
+            timings.append((time.perf_counter() - started) * 1000)
+        if database is not None:
+            database.close()
+        results.extend(timings)
+
+    def operation(self, database, kind, rng):
+        if kind == 'read':
+            database.execute(READ, (rng.randrange(AUTHORS),)).fetchall()
+            return
+        with database:
+            database.execute(
+                WRITE, (rng.randrange(AUTHORS), 'Новый пост', time.time())
+            )
@@ -0,0 +1,97 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в свежем интерпретаторе: замер включает импорт wsgi.py.
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+from wsgiref.util import setup_testing_defaults
+from yatube.wsgi import application
+ready = time.perf_counter()
+report = {"startup_ms": (ready - started) * 1000, "responses": []}
+for path in sys.argv[1:]:
+    environ = {"PATH_INFO": path}
+    setup_testing_defaults(environ)
+    statuses = []
+    began = time.perf_counter()
+    body = b"".join(application(environ, lambda s, h: statuses.append(s)))
+    report["responses"].append({
+        "path": path,
+        "status": statuses[0],
+        "ms": (time.perf_counter() - began) * 1000,
+        "bytes": len(body),
+    })
+report["first_response_ms"] = (
+    report["startup_ms"] + report["responses"][0]["ms"]
+)
+print(json.dumps(report))
+'''
+PATHS = ('/', '/', '/about/tech/', '/auth/login/')
+
+
+class Command(BaseCommand):
+    help = (
+        'Время до первого ответа нового воркера с прогревом из wsgi.py и '
+        'без него: каждый замер в отдельном процессе на текущей БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument(
+            'paths', nargs='*', default=PATHS,
+            help='Адреса по порядку; первый считается первым ответом.',
+        )
+
+    def handle(self, *args, **options):
+        report = {}
+        for mode, warm in (('cold', '0'), ('warm', '1')):
+            runs = [
+                self.probe(warm, options['paths'])
+                for _ in range(options['repeat'])
+            ]
+            report[mode] = self.summary(runs)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def probe(self, warm, paths):
+        environment = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'yatube.settings'
+            ),
+            'YATUBE_WARM_UP': warm,
+        }
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, *paths],
+            cwd=settings.BASE_DIR, env=environment,
+            capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def summary(self, runs):
+        """Медианы по запускам: старт, первый ответ и каждый адрес."""
+        def median(values):
+            return round(sorted(values)[len(values) // 2], 3)
+
+        return {
+            'startup_ms': median([run['startup_ms'] for run in runs]),
+            'first_response_ms': median(
+                [run['first_response_ms'] for run in runs]
+            ),
+            'responses': [
+                {
+                    'path': sample['path'],
+                    'status': sample['status'],
+                    'ms': median(
+                        [run['responses'][index]['ms'] for run in runs]
+                    ),
+                }
+                for index, sample in enumerate(runs[0]['responses'])
+            ],
+        }
@@ -0,0 +1,275 @@
+import io
+import json
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from core.benchmark import percentile
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# Вес маршрута в смеси и нужен ли для него вход на сайт.
+ROUTES = {
+    'index': (30, False),
+    'group_list': (15, False),
+    'profile': (15, False),
+    'post_detail': (25, False),
+    'follow_index': (10, True),
+    'post_create': (3, True),
+    'add_comment': (2, True),
+}
+WRITE_ROUTES = {'post_create', 'add_comment'}
+SAMPLE_SIZE = 1000
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _environ(method, path, cookies, body=b'', headers=None):
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': 'localhost',
+        'HTTP_COOKIE': '; '.join(f'{k}={v}' for k, v in cookies.items()),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'CONTENT_LENGTH': str(len(body)),
+        'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+    }
+    environ.update(headers or {})
+    return environ
+
+
+def _call(application, environ):
+    status = []
+
+    def start_response(status_line, response_headers, exc_info=None):
+        status.append(int(status_line.split()[0]))
+
+    response = application(environ, start_response)
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return status[0]
+
+
+def _build_request(plan, rng):
+    route = rng.choices(plan['routes'], plan['weights'])[0]
+    logged_in = ROUTES[route][1] or rng.random() < plan['logged_in']
+    cookies = rng.choice(plan['sessions']) if logged_in else {}
+    method, body, headers = 'GET', b'', {}
+    if route == 'index':
+        path = reverse('posts:index')
+    elif route == 'group_list':
+        path = reverse('posts:group_list', args=[rng.choice(plan['groups'])])
+    elif route == 'profile':
+        path = reverse('posts:profile', args=[rng.choice(plan['users'])])
+    elif route == 'post_detail':
+        path = reverse('posts:post_detail', args=[rng.choice(plan['posts'])])
+    elif route == 'follow_index':
+        path = reverse('posts:follow_index')
+    elif route == 'post_create':
+        path = reverse('posts:post_create')
+        body = urlencode({'text': 'Пост нагрузочного теста'}).encode()
+    else:
+        path = reverse('posts:add_comment', args=[rng.choice(plan['posts'])])
+        body = urlencode({'text': 'Комментарий нагрузочного теста'}).encode()
+    if body:
+        method = 'POST'
+        headers['HTTP_X_CSRFTOKEN'] = cookies['csrftoken']
+    return route, _environ(method, path, cookies, body, headers)
+
+
+def _thread_worker(plan, requests, seed):
+    from yatube.wsgi import application
+
+    rng = random.Random(seed)
+    counter = QueryCounter()
+    samples = []
+    with connection.execute_wrapper(counter):
+        for _ in range(requests):
+            route, environ = _build_request(plan, rng)
+            counter.count = 0
+            started = time.perf_counter()
+            try:
+                status = _call(application, environ)
+            except Exception:
+                status = 599
+            elapsed = (time.perf_counter() - started) * 1000
+            samples.append((route, status, elapsed, counter.count))
+    connection.close()
+    return samples
+
+
+def _process_worker(plan, threads, requests, seed):
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        jobs = [
+            pool.submit(
+                _thread_worker,
+                plan,
+                requests // threads + (number < requests % threads),
+                seed * 1000 + number,
+            )
+            for number in range(threads)
+        ]
+        return [sample for job in jobs for sample in job.result()]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест маршрутов posts через WSGI-приложение в процессе. '
+        'Печатает JSON с задержками, RPS и запросами к БД по маршрутам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--processes', type=int, default=1)
+        parser.add_argument(
+            '--logged-in', type=float, default=0.3,
+            help='Доля запросов к публичным страницам от вошедших.',
+        )
+        parser.add_argument(
+            '--read-only', action='store_true',
+            help='Не слать post_create и add_comment.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Файл для JSON-отчёта.')
+
+    def handle(self, *args, **options):
+        plan = self.make_plan(options)
+        processes = options['processes']
+        total = options['requests']
+        shares = [
+            total // processes + (number < total % processes)
+            for number in range(processes)
+        ]
+        started = time.perf_counter()
+        if processes == 1:
+            samples = _process_worker(
+                plan, options['threads'], total, options['seed']
+            )
+        else:
+            # Дочерние процессы не должны делить открытое соединение с БД.
+            connections.close_all()
+            context = multiprocessing.get_context('fork')
+            with ProcessPoolExecutor(processes, mp_context=context) as pool:
+                jobs = [
+                    pool.submit(
+                        _process_worker, plan, options['threads'], share,
+                        options['seed'] + number,
+                    )
+                    for number, share in enumerate(shares)
+                ]
+                samples = [s for job in jobs for s in job.result()]
+        wall = time.perf_counter() - started
+        report = self.report(samples, wall, options)
+        output = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w') as report_file:
+                report_file.write(output)
+        self.stdout.write(output)
+
+    def make_plan(self, options):
+        routes = [
+            name for name in ROUTES
+            if not (options['read_only'] and name in WRITE_ROUTES)
+        ]
+        # Свежие строки — и самые посещаемые, и дешёвые для выборки.
+        posts = list(
+            Post.objects.order_by('-pk').values_list('pk', flat=True)[
+                :SAMPLE_SIZE
+            ]
+        )
+        groups = list(
+            Group.objects.order_by('-pk').values_list('slug', flat=True)[
+                :SAMPLE_SIZE
+            ]
+        )
+        users = list(User.objects.order_by('-pk')[:SAMPLE_SIZE])
+        if not posts or not groups or not users:
+            raise CommandError(
+                'В базе нужны посты, группы и пользователи: '
+                'заполните её командой seed.'
+            )
+        return {
+            'routes': routes,
+            'weights': [ROUTES[name][0] for name in routes],
+            'logged_in': options['logged_in'],
+            'posts': posts,
+            'groups': groups,
+            'users': [user.username for user in users],
+            'sessions': [self.login(user) for user in users[:100]],
+        }
+
+    def login(self, user):
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return {
+            settings.SESSION_COOKIE_NAME: session.session_key,
+            settings.CSRF_COOKIE_NAME: get_random_string(32),
+        }
+
+    def report(self, samples, wall, options):
+        by_route = defaultdict(list)
+        for sample in samples:
+            by_route[sample[0]].append(sample)
+        routes = {}
+        for route, rows in sorted(by_route.items()):
+            timings = sorted(row[2] for row in rows)
+            routes[route] = {
+                'requests': len(rows),
+                'errors': sum(1 for row in rows if row[1] >= 400),
+                'rps': round(len(rows) / wall, 2),
+                'p50_ms': round(percentile(timings, 50), 3),
+                'p95_ms': round(percentile(timings, 95), 3),
+                'p99_ms': round(percentile(timings, 99), 3),
+                'queries_per_request': round(
+                    sum(row[3] for row in rows) / len(rows), 2
+                ),
+            }
+        return {
+            'requests': len(samples),
+            'seconds': round(wall, 3),
+            'rps': round(len(samples) / wall, 2),
+            'threads': options['threads'],
+            'processes': options['processes'],
+            'logged_in': options['logged_in'],
+            'routes': routes,
+        }
@@ -0,0 +1,152 @@
+"""Отдача загруженных файлов из MEDIA_ROOT.
+
+С MEDIA_ACCEL Django только проверяет путь и условия запроса, а байты
+отправляет фронтенд-сервер: nginx по X-Accel-Redirect во внутренний
+location MEDIA_ACCEL_PREFIX, Apache или lighttpd по X-Sendfile.
+Без прокси файл уходит через wsgi.file_wrapper: gunicorn и uWSGI
+передают его os.sendfile с текущей позиции файла и ровно Content-Length
+байт, поэтому и диапазоны Range идут без копирования в Python.
+"""
+import mimetypes
+import os
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+ACCEL_MODES = ('x-accel-redirect', 'x-sendfile')
+
+
+class UnsatisfiableRange(Exception):
+    pass
+
+
+class FileRange:
+    """Часть открытого файла: read() не выходит за неё, fileno() — для
+    sendfile на стороне WSGI-сервера."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(начало, конец) одного диапазона bytes=…; None — отдать весь файл.
+
+    Несколько диапазонов и неверный синтаксис игнорируются, как разрешает
+    RFC 7233; диапазон за концом файла — UnsatisfiableRange.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    try:
+        if not first:
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                raise UnsatisfiableRange
+            return max(size - suffix, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise UnsatisfiableRange
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range: диапазон отдаётся, только если файл не менялся."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return etag in parse_etags(if_range)
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def media_response(request, name, path):
+    """Ответ на GET/HEAD файла path с именем name относительно MEDIA_ROOT.
+
+    None — файла нет.
+    """
+    try:
+        info = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    if not stat.S_ISREG(info.st_mode):
+        return None
+    etag = '"%x-%x"' % (info.st_mtime_ns, info.st_size)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(info.st_mtime)
+    )
+    if response is None:
+        response = _file_response(request, name, path, info, etag)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(info.st_mtime)
+    response['Cache-Control'] = 'public, max-age=%d' % settings.MEDIA_MAX_AGE
+    return response
+
+
+def _file_response(request, name, path, info, etag):
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    mode = settings.MEDIA_ACCEL
+    if mode:
+        if mode not in ACCEL_MODES:
+            raise ImproperlyConfigured(
+                'MEDIA_ACCEL должен быть одним из %s.' % ', '.join(ACCEL_MODES)
+            )
+        # Range и отдачу байтов сервер выполняет сам.
+        response = HttpResponse(content_type=content_type)
+        if mode == 'x-accel-redirect':
+            response['X-Accel-Redirect'] = (
+                settings.MEDIA_ACCEL_PREFIX + quote(name)
+            )
+        else:
+            response['X-Sendfile'] = path
+        return response
+    size = info.st_size
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _range_applies(
+        request, etag, info.st_mtime
+    ):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except UnsatisfiableRange:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            FileRange(file, start, end - start + 1),
+            status=206, content_type=content_type,
+        )
+        response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
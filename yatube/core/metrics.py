@@ -0,0 +1,345 @@
+"""Метрики по представлениям в текстовом формате Prometheus.
+
+Каждый поток копит значения в своём шарде, поэтому запись в горячем пути
+не берёт общих блокировок: замок шарда нужен только при появлении нового
+ключа и при чтении. Если задан METRICS_DIR, процесс раз в
+METRICS_FLUSH_INTERVAL секунд сбрасывает свой снимок в файл <pid>.json,
+а эндпоинт складывает снимки всех воркеров.
+"""
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+UNRESOLVED = '<unresolved>'
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Имя, тип и описание; порядок задаёт порядок вывода.
+METRICS = (
+    ('yatube_http_requests_total', 'counter',
+     'Ответы по представлению, методу и статусу.'),
+    ('yatube_http_request_duration_seconds', 'histogram',
+     'Время обработки запроса.'),
+    ('yatube_db_queries_total', 'counter',
+     'SQL-запросы, выполненные при обработке запросов.'),
+    ('yatube_db_query_duration_seconds_total', 'counter',
+     'Суммарное время SQL-запросов.'),
+    ('yatube_template_render_seconds_total', 'counter',
+     'Суммарное время рендеринга шаблонов.'),
+    ('yatube_template_renders_total', 'counter',
+     'Число рендерингов шаблонов верхнего уровня.'),
+    ('yatube_cache_requests_total', 'counter',
+     'Обращения к кешам приложения: попадания и промахи.'),
+    ('yatube_cache_tier_requests_total', 'counter',
+     'Попадания и промахи по уровням двухуровневого кеша.'),
+    ('yatube_cache_l1_bytes', 'gauge',
+     'Память под значения в L1 двухуровневого кеша.'),
+    ('yatube_cache_l1_entries', 'gauge',
+     'Записи в L1 двухуровневого кеша.'),
+    ('yatube_tasks_total', 'counter',
+     'Фоновые задачи, завершённые успешно или с ошибкой.'),
+    ('yatube_task_queue_depth', 'gauge',
+     'Задачи в очереди или в работе.'),
+    ('yatube_feed_fragment_requests_total', 'counter',
+     'Попадания и промахи фрагментов лент по именам фрагментов.'),
+)
+FRAGMENT_METRIC = 'yatube_feed_fragment_requests_total'
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_shards = []
+_pid = os.getpid()
+_flushed_at = 0.0
+
+
+class Shard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def add(self, key, amount):
+        try:
+            self.values[key] += amount
+        except KeyError:
+            with self.lock:
+                self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, key, value):
+        try:
+            buckets = self.values[key]
+        except KeyError:
+            with self.lock:
+                buckets = self.values.setdefault(
+                    key, [0] * (len(DURATION_BUCKETS) + 2)
+                )
+        for index, bound in enumerate(DURATION_BUCKETS):
+            if value <= bound:
+                buckets[index] += 1
+                break
+        buckets[-2] += value
+        buckets[-1] += 1
+
+    def copy(self):
+        with self.lock:
+            return {
+                key: list(value) if isinstance(value, list) else value
+                for key, value in self.values.items()
+            }
+
+
+def _shard():
+    shard = getattr(_local, 'shard', None)
+    if shard is None:
+        shard = _local.shard = Shard()
+        with _registry_lock:
+            _shards.append(shard)
+    return shard
+
+
+def _reset_after_fork():
+    """Воркер после fork не должен отдавать счётчики родителя как свои."""
+    global _pid, _shards
+    with _registry_lock:
+        _pid = os.getpid()
+        _shards = []
+    _local.__dict__.clear()
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+class RequestMetrics:
+    """Метрики одного запроса; живут в потоке, пока запрос обрабатывается."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.template_time = 0.0
+        self.templates = 0
+        self.cache = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - started
+
+
+def begin_request():
+    if os.getpid() != _pid:
+        _reset_after_fork()
+    _local.request = RequestMetrics()
+    return _local.request
+
+
+def end_request(request_metrics, view, method, status, duration):
+    _local.request = None
+    shard = _shard()
+    labels = _labels(view=view)
+    shard.add(
+        ('yatube_http_requests_total',
+         _labels(view=view, method=method, status=str(status))),
+        1,
+    )
+    shard.observe(('yatube_http_request_duration_seconds', labels), duration)
+    shard.add(('yatube_db_queries_total', labels), request_metrics.queries)
+    shard.add(
+        ('yatube_db_query_duration_seconds_total', labels),
+        request_metrics.query_time,
+    )
+    if request_metrics.templates:
+        shard.add(
+            ('yatube_template_render_seconds_total', labels),
+            request_metrics.template_time,
+        )
+        shard.add(
+            ('yatube_template_renders_total', labels),
+            request_metrics.templates,
+        )
+    for (cache, result), count in request_metrics.cache.items():
+        shard.add(
+            ('yatube_cache_requests_total',
+             _labels(view=view, cache=cache, result=result)),
+            count,
+        )
+    maybe_flush()
+
+
+def _current():
+    return getattr(_local, 'request', None)
+
+
+def record_template(duration):
+    current = _current()
+    if current is not None:
+        current.template_time += duration
+        current.templates += 1
+
+
+def record_cache(cache, hit):
+    """Отмечает попадание или промах кеша cache в текущем запросе."""
+    current = _current()
+    if current is not None:
+        key = (cache, 'hit' if hit else 'miss')
+        current.cache[key] = current.cache.get(key, 0) + 1
+
+
+def record_fragment(name, hit):
+    """Отмечает попадание или промах фрагмента лент name в процессе."""
+    _shard().add(
+        (
+            FRAGMENT_METRIC,
+            _labels(fragment=name, result='hit' if hit else 'miss'),
+        ),
+        1,
+    )
+
+
+def snapshot():
+    """Сумма шардов процесса вместе со статистикой задач и кеша."""
+    from .cache import TIERS, tier_stats
+    from .tasks import task_stats
+
+    with _registry_lock:
+        shards = list(_shards)
+    merged = {}
+    for shard in shards:
+        _merge(merged, shard.copy())
+    stats = task_stats()
+    merged[('yatube_tasks_total', _labels(result='completed'))] = (
+        stats['completed'] - stats['failed']
+    )
+    merged[('yatube_tasks_total', _labels(result='failed'))] = stats['failed']
+    merged[('yatube_task_queue_depth', ())] = stats['queue_depth']
+    for location, cache_stats in tier_stats().items():
+        for tier in TIERS:
+            for field, result in (('hits', 'hit'), ('misses', 'miss')):
+                merged[(
+                    'yatube_cache_tier_requests_total',
+                    _labels(cache=location, tier=tier, result=result),
+                )] = cache_stats[tier][field]
+        merged[('yatube_cache_l1_bytes', _labels(cache=location))] = (
+            cache_stats['l1_bytes']
+        )
+        merged[('yatube_cache_l1_entries', _labels(cache=location))] = (
+            cache_stats['l1_entries']
+        )
+    return merged
+
+
+def _merge(target, values):
+    for key, value in values.items():
+        if key not in target:
+            target[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            target[key] = [a + b for a, b in zip(target[key], value)]
+        else:
+            target[key] += value
+
+
+def flush():
+    """Записывает снимок процесса в METRICS_DIR атомарной заменой файла."""
+    global _flushed_at
+    _flushed_at = time.monotonic()
+    directory = settings.METRICS_DIR
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    rows = [
+        [name, list(map(list, labels)), value]
+        for (name, labels), value in snapshot().items()
+    ]
+    path = os.path.join(directory, '%d.json' % os.getpid())
+    temporary = '%s.%d.tmp' % (path, threading.get_ident())
+    with open(temporary, 'w') as snapshot_file:
+        json.dump(rows, snapshot_file)
+    os.replace(temporary, path)
+
+
+def maybe_flush():
+    if (
+        settings.METRICS_DIR
+        and time.monotonic() - _flushed_at >= settings.METRICS_FLUSH_INTERVAL
+    ):
+        flush()
+
+
+def collect():
+    """Метрики всех процессов: свои — свежие, чужие — из их снимков."""
+    if not settings.METRICS_DIR:
+        return snapshot()
+    flush()
+    merged = {}
+    for entry in os.scandir(settings.METRICS_DIR):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as snapshot_file:
+                rows = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        _merge(merged, {
+            (name, tuple(map(tuple, labels))): value
+            for name, labels, value in rows
+        })
+    return merged
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + sorted(extra.items())
+    if not pairs:
+        return ''
+    escaped = (
+        '%s="%s"' % (key, str(value).replace('\\', r'\\').replace('"', r'\"'))
+        for key, value in pairs
+    )
+    return '{%s}' % ','.join(escaped)
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(values, extra=()):
+    """Текст в формате Prometheus 0.0.4; extra — (имя, метки, значение)."""
+    by_name = {}
+    for (name, labels), value in values.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name, labels, value in extra:
+        by_name.setdefault(name, []).append((labels, value))
+    lines = []
+    for name, kind, help_text in METRICS:
+        samples = sorted(by_name.get(name, ()))
+        if not samples:
+            continue
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, kind))
+        for labels, value in samples:
+            if kind != 'histogram':
+                lines.append(
+                    '%s%s %s' % (name, _format_labels(labels), _number(value))
+                )
+                continue
+            cumulative = 0
+            for bound, count in zip(DURATION_BUCKETS, value):
+                cumulative += count
+                lines.append('%s_bucket%s %d' % (
+                    name, _format_labels(labels, le=repr(bound)), cumulative
+                ))
+            lines.append('%s_bucket%s %d' % (
+                name, _format_labels(labels, le='+Inf'), value[-1]
+            ))
+            lines.append('%s_sum%s %s' % (
+                name, _format_labels(labels), _number(value[-2])
+            ))
+            lines.append('%s_count%s %d' % (
+                name, _format_labels(labels), value[-1]
+            ))
+    return '\n'.join(lines) + '\n'
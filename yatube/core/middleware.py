@@ -0,0 +1,144 @@
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import metrics
+from .routers import read_from_replica
+from .staticfiles import accepts_gzip, static_index
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class StaticFilesMiddleware:
+    """Отдаёт собранную статику из STATIC_ROOT без похода в представления.
+
+    Список файлов строится при запуске воркера: после collectstatic
+    воркеры нужно перезапустить. Без STATIC_ROOT запросы проходят дальше,
+    в разработке статику отдаёт runserver.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.files = {}
+        root = settings.STATIC_ROOT
+        if root and os.path.isdir(root):
+            hashed = getattr(staticfiles_storage, 'hashed_files', {})
+            self.files = static_index(root, hashed.values())
+
+    def __call__(self, request):
+        static = self.files.get(request.path_info)
+        if static is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            static.mtime, static.size,
+        ):
+            response = HttpResponseNotModified()
+        elif static.gzipped and accepts_gzip(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        ):
+            response = FileResponse(
+                open(static.gzipped, 'rb'), content_type=static.content_type
+            )
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = FileResponse(
+                open(static.path, 'rb'), content_type=static.content_type
+            )
+        response['Last-Modified'] = http_date(static.mtime)
+        if static.gzipped:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        if static.immutable:
+            response['Cache-Control'] = 'public, max-age=%d, immutable' % (
+                settings.STATIC_IMMUTABLE_MAX_AGE
+            )
+        else:
+            response['Cache-Control'] = 'public, max-age=%d' % (
+                settings.STATIC_MAX_AGE
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """Собирает метрики запроса по имени разрешённого URL."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.begin_request()
+        started = time.perf_counter()
+        status = 500
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(request_metrics)
+                    )
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            match = request.resolver_match
+            metrics.end_request(
+                request_metrics,
+                match.view_name if match else metrics.UNRESOLVED,
+                request.method,
+                status,
+                time.perf_counter() - started,
+            )
+
+
+class WriteDetector:
+    def __init__(self):
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            self.wrote = True
+        return execute(sql, params, many, context)
+
+
+class ReplicaMiddleware:
+    """Отправляет чтения страниц REPLICA_VIEWS на реплики.
+
+    После записи в основную БД клиент получает cookie и на
+    REPLICA_STICKY_SECONDS остаётся на основной базе, чтобы увидеть
+    свои изменения, пока реплики их догоняют.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        detector = WriteDetector()
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(detector):
+                response = self.get_response(request)
+        finally:
+            read_from_replica(False)
+        if detector.wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        read_from_replica(
+            bool(settings.DATABASE_REPLICAS)
+            and request.method in ('GET', 'HEAD')
+            and settings.REPLICA_STICKY_COOKIE not in request.COOKIES
+            and request.resolver_match.view_name in settings.REPLICA_VIEWS
+        )
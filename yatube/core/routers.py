@@ -0,0 +1,51 @@
+"""Чтение с реплик для тяжёлых на чтение страниц.
+
+Маршрутизатор отправляет чтения на реплику, только пока поток
+обрабатывает страницу из REPLICA_VIEWS (флаг ставит ReplicaMiddleware).
+Все записи, фоновые задачи и остальные страницы работают с основной БД.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+_local = threading.local()
+
+
+def read_from_replica(enabled):
+    _local.replica = enabled
+
+
+@contextmanager
+def use_replica():
+    previous = getattr(_local, 'replica', False)
+    _local.replica = True
+    try:
+        yield
+    finally:
+        _local.replica = previous
+
+
+def reading_from_replica():
+    return getattr(_local, 'replica', False) and bool(
+        settings.DATABASE_REPLICAS
+    )
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной БД, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,70 @@
+"""Сессии в кеше с отложенным продлением срока в БД.
+
+Сессия читается из кеша, а в БД идёт только при промахе. Данные
+записываются в БД сразу, как в cached_db. Если же сессия лишь продлевается
+(SESSION_SAVE_EVERY_REQUEST), новый срок сразу попадает в кеш, а в БД
+уходит фоновой задачей не чаще раза в SESSION_EXPIRY_REFRESH секунд:
+срок в БД отстаёт от настоящего не больше чем на этот интервал.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+
+from .tasks import enqueue
+
+KEY_PREFIX = 'core.sessions'
+
+
+def refresh_expiry(session_key, expire_date):
+    SessionStore.get_model_class().objects.filter(
+        session_key=session_key
+    ).update(expire_date=expire_date)
+
+
+class SessionStore(cached_db.SessionStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        # Срок, который сейчас записан в БД.
+        self._stored_expiry = None
+        super().__init__(session_key)
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # Как в cached_db: некорректный ключ сбрасывает сессию.
+            entry = None
+        if entry is None:
+            session = self._get_session_from_db()
+            if session is None:
+                self._stored_expiry = None
+                return {}
+            entry = (self.decode(session.session_data), session.expire_date)
+            self._cache.set(
+                self.cache_key, entry,
+                self.get_expiry_age(expiry=session.expire_date),
+            )
+        data, self._stored_expiry = entry
+        return data
+
+    def save(self, must_create=False):
+        expiry = self.get_expiry_date()
+        if (
+            self.session_key is not None
+            and not must_create
+            and not self.modified
+            and self._stored_expiry is not None
+        ):
+            if expiry - self._stored_expiry < timedelta(
+                seconds=settings.SESSION_EXPIRY_REFRESH
+            ):
+                return
+            enqueue(refresh_expiry, self.session_key, expiry)
+        else:
+            super(cached_db.SessionStore, self).save(must_create)
+        self._stored_expiry = expiry
+        self._cache.set(
+            self.cache_key, (self._session, expiry), self.get_expiry_age()
+        )
@@ -0,0 +1,99 @@
+"""Статика с хешами в именах и заранее сжатыми копиями.
+
+collectstatic через CompressedManifestStorage кладёт в STATIC_ROOT
+файлы с хешем содержимого в имени, manifest и рядом .gz для текстовых
+форматов. StaticFilesMiddleware отдаёт их из STATIC_ROOT: сжатую копию,
+если клиент принимает gzip, и заголовок immutable для имён с хешем —
+такое имя меняется вместе с содержимым.
+"""
+import gzip
+import mimetypes
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.xml', '.html')
+# Меньше этого gzip почти не выигрывает, а заголовки съедают разницу.
+MIN_COMPRESS_SIZE = 256
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            if name.endswith(COMPRESSIBLE):
+                compressed = self.compress(name)
+                if compressed:
+                    yield name, compressed, True
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return None
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(packed) >= len(data) * 0.95:
+            return None
+        compressed = name + '.gz'
+        if self.exists(compressed):
+            self.delete(compressed)
+        self.save(compressed, ContentFile(packed))
+        return compressed
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic ещё не запускали: ссылка без хеша, файл
+            # найдут finders в разработке или вернётся 404.
+            return name
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        self.content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        self.size = os.path.getsize(path)
+        self.mtime = os.path.getmtime(path)
+        gzipped = path + '.gz'
+        self.gzipped = gzipped if os.path.exists(gzipped) else None
+        self.gzipped_size = os.path.getsize(gzipped) if self.gzipped else 0
+
+
+def static_index(root, hashed_names):
+    """URL → StaticFile для всех файлов STATIC_ROOT, кроме .gz-копий."""
+    index = {}
+    hashed_names = set(hashed_names)
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            if filename.endswith('.gz'):
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            index[settings.STATIC_URL + name] = StaticFile(
+                path, name in hashed_names
+            )
+    return index
+
+
+def accepts_gzip(header):
+    """Разрешает ли Accept-Encoding ответ в gzip; q=0 означает отказ."""
+    for coding in header.split(','):
+        name, _, params = coding.partition(';')
+        if name.strip().lower() not in ('gzip', '*'):
+            continue
+        params = params.replace(' ', '')
+        if not params.startswith('q='):
+            return True
+        try:
+            return float(params[2:]) > 0
+        except ValueError:
+            return False
+    return False
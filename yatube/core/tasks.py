@@ -0,0 +1,75 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+_pending = 0
+_completed = 0
+_failed = 0
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TASK_WORKERS,
+                thread_name_prefix='yatube-task',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    global _pending, _completed, _failed
+    close_old_connections()
+    failed = False
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        failed = True
+        logger.exception('Фоновая задача %s упала', func.__name__)
+    finally:
+        close_old_connections()
+        with _lock:
+            _pending -= 1
+            _completed += 1
+            _failed += failed
+
+
+def _submit(func, args, kwargs):
+    global _pending
+    with _lock:
+        _pending += 1
+    _get_executor().submit(_run, func, args, kwargs)
+
+
+def enqueue(func, *args, **kwargs):
+    """Запускает func в пуле после коммита текущей транзакции.
+
+    При TASKS_ALWAYS_EAGER задача выполняется сразу в вызывающем потоке:
+    так работают тесты и локальная разработка.
+    """
+    if settings.TASKS_ALWAYS_EAGER:
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(lambda: _submit(func, args, kwargs))
+
+
+def queue_depth():
+    """Сколько задач ждут или выполняются прямо сейчас."""
+    return _pending
+
+
+def task_stats():
+    with _lock:
+        return {
+            'queue_depth': _pending,
+            'completed': _completed,
+            'failed': _failed,
+        }
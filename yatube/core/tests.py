@@ -1,6 +1,36 @@
+import json
+import os
+import shutil
+import tempfile
+import time
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.template import engines
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import (
+    Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from core import cache as tiered_cache
+from core import metrics
+from core.benchmark import percentile
+from core.warmup import warm_up
+from core.middleware import ReplicaMiddleware
+from core.routers import ReplicaRouter, reading_from_replica, use_replica
+from posts.feed_cache import GENERATION_KEY, bump_generation
+from posts.models import Group, Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -12,3 +42,487 @@ class ViewTestClass(TestCase):
         """URL-адрес использует соответствующий шаблон."""
         response = self.client.get('/nonexist-page/')
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class LoadTestCommandTest(TestCase):
+    def test_percentile(self):
+        """Перцентиль считается методом ближайшего ранга."""
+        ordered = list(range(1, 101))
+        self.assertEqual(percentile(ordered, 50), 50)
+        self.assertEqual(percentile(ordered, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_empty_database(self):
+        """Без данных команда сообщает об ошибке."""
+        with self.assertRaises(CommandError):
+            call_command('loadtest', requests=1, stdout=StringIO())
+
+
+class LoadTestReportTest(TransactionTestCase):
+    # Потоки нагрузки открывают свои соединения и видят только закоммиченное.
+    def test_report(self):
+        """Отчёт содержит задержки и запросы к БД по маршрутам."""
+        user = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=user, group=group, text='Пост')
+        out = StringIO()
+        call_command(
+            'loadtest', requests=20, threads=1, read_only=True, stdout=out
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['requests'], 20)
+        for stats in report['routes'].values():
+            self.assertEqual(stats['errors'], 0)
+            self.assertIn('p99_ms', stats)
+            self.assertGreater(stats['queries_per_request'], 0)
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsTest(TestCase):
+    def scrape(self):
+        response = self.client.get(
+            reverse('core:metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.content.decode()
+
+    def test_view_metrics_exposed(self):
+        """Запрос к ленте попадает в метрики по имени URL."""
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_http_requests_total{method="GET",status="200",'
+            'view="posts:index"}',
+            text,
+        )
+        self.assertIn(
+            'yatube_http_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"}',
+            text,
+        )
+        self.assertIn('yatube_db_queries_total{view="posts:index"}', text)
+        self.assertIn(
+            'yatube_template_render_seconds_total{view="posts:index"}', text
+        )
+        self.assertIn(
+            'yatube_cache_requests_total{cache="feed_fragment",'
+            'result="miss",view="posts:index"}',
+            text,
+        )
+
+    def test_metrics_closed_without_token(self):
+        """Без токена эндпоинт закрыт, в том числе для адреса прокси."""
+        for headers in (
+            {},
+            {'REMOTE_ADDR': '127.0.0.1'},
+            {'HTTP_AUTHORIZATION': 'Bearer wrong'},
+            {'HTTP_AUTHORIZATION': 'Basic secret'},
+        ):
+            with self.subTest(headers=headers):
+                response = self.client.get(reverse('core:metrics'), **headers)
+                self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        with override_settings(METRICS_TOKEN=None):
+            response = self.client.get(
+                reverse('core:metrics'), HTTP_AUTHORIZATION='Bearer '
+            )
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_metrics_open_for_staff_and_allowed_ips(self):
+        """Персоналу и адресам из METRICS_ALLOWED_IPS токен не нужен."""
+        with override_settings(METRICS_ALLOWED_IPS=['10.0.0.5']):
+            response = self.client.get(
+                reverse('core:metrics'), REMOTE_ADDR='10.0.0.5'
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True)
+        )
+        response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_worker_snapshots_are_summed(self):
+        """Снимки других воркеров складываются с метриками процесса."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, '1.json'), 'w') as other:
+            json.dump(
+                [['yatube_db_queries_total', [['view', 'posts:other']], 7]],
+                other,
+            )
+        with override_settings(METRICS_DIR=directory):
+            text = self.scrape()
+        self.assertIn('yatube_db_queries_total{view="posts:other"} 7', text)
+        self.assertIn('%d.json' % os.getpid(), os.listdir(directory))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def route(self, request):
+        """Пропускает запрос через middleware: читал ли view с реплики."""
+        seen = []
+
+        def get_response(request):
+            request.resolver_match = resolve(request.path_info)
+            middleware.process_view(request, None, (), {})
+            seen.append(reading_from_replica())
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(get_response)
+        middleware(request)
+        self.assertFalse(reading_from_replica())
+        return seen[0]
+
+    def test_router(self):
+        """Чтения уходят на реплику только внутри use_replica."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        with use_replica():
+            self.assertEqual(self.router.db_for_read(Post), 'replica1')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+
+    def test_replica_views(self):
+        """Лента читает с реплики, формы и POST — с основной БД."""
+        self.assertTrue(self.route(self.factory.get(reverse('posts:index'))))
+        self.assertFalse(
+            self.route(self.factory.get(reverse('posts:post_create')))
+        )
+        self.assertFalse(
+            self.route(self.factory.post(reverse('posts:index')))
+        )
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertFalse(
+                self.route(self.factory.get(reverse('posts:index')))
+            )
+
+    @override_settings(DATABASE_REPLICAS=['default'])
+    def test_sticky_cookie(self):
+        """После записи клиент на время остаётся на основной БД."""
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        response = self.client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        cookie = response.cookies[settings.REPLICA_STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+        request = self.factory.get(reverse('posts:index'))
+        self.assertTrue(self.route(request))
+        request.COOKIES[settings.REPLICA_STICKY_COOKIE] = '1'
+        self.assertFalse(self.route(request))
+
+
+class DatabaseProfileTest(TestCase):
+    def test_pragmas_applied(self):
+        """Новое соединение SQLite получает PRAGMA из настроек."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+
+    def test_bench_db(self):
+        """Бенчмарк сравнивает оба профиля и не встречает ошибок."""
+        out = StringIO()
+        call_command(
+            'bench_db', rows=100, readers=1, writers=1, seconds=0.1,
+            stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report), {'baseline', 'tuned'})
+        self.assertEqual(report['tuned']['errors'], 0)
+        self.assertGreater(report['tuned']['read']['ops'], 0)
+
+
+class TieredCacheTest(TestCase):
+    """Два «процесса» с общим файловым L2 и своими L1."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        shared = {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': directory,
+        }
+        tiered = {
+            'BACKEND': 'core.cache.TieredCache',
+            'OPTIONS': {'MAX_ENTRIES': 2, 'SYNC_INTERVAL': 0},
+        }
+        overrides = override_settings(CACHES={
+            **settings.CACHES,
+            'l2_one': shared,
+            'l2_two': shared,
+            'l2_three': shared,
+            'log': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'tiered-test-log',
+            },
+            'one': {**tiered, 'LOCATION': 'l2_one'},
+            'two': {**tiered, 'LOCATION': 'l2_two'},
+            'three': {
+                'BACKEND': 'core.cache.TieredCache',
+                'LOCATION': 'l2_three',
+                'OPTIONS': {
+                    'LOG_CACHE': 'log', 'LOG_SIZE': 3, 'LOG_TIMEOUT': 5,
+                },
+            },
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for location in ('l2_one', 'l2_two', 'l2_three'):
+            tiered_cache._tiers.pop(location, None)
+        self.one, self.two = caches['one'], caches['two']
+
+    def test_repeat_reads_served_from_l1(self):
+        """Повторное чтение не ходит в L2, а L1 ограничен по размеру."""
+        self.one.set('a', 1)
+        self.two.get('a')
+        self.two.get('a')
+        stats = tiered_cache.tier_stats()['l2_two']
+        self.assertEqual(stats['l1']['hits'], 1)
+        self.assertEqual(stats['l2']['hits'], 1)
+        self.one.set_many({'b': 2, 'c': 3})
+        stats = tiered_cache.tier_stats()['l2_one']
+        self.assertEqual(stats['l1_entries'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertIn(
+            'yatube_cache_l1_entries{cache="l2_one"} 2',
+            metrics.render(metrics.snapshot()),
+        )
+
+    def test_writes_invalidate_other_l1(self):
+        """Запись в одном процессе убирает старое значение из L1 другого."""
+        self.one.set('post', 'старый')
+        self.assertEqual(self.two.get('post'), 'старый')
+        self.one.set('post', 'новый')
+        self.assertEqual(self.two.get('post'), 'новый')
+        self.one.add('views', 1)
+        self.assertEqual(self.two.get('views'), 1)
+        self.one.incr('views')
+        self.assertEqual(self.two.get('views'), 2)
+        self.one.delete('post')
+        self.assertIsNone(self.two.get('post'))
+        self.assertGreater(
+            tiered_cache.tier_stats()['l2_two']['invalidations'], 0
+        )
+
+    def test_log_is_bounded_and_expires(self):
+        """Журнал хранит не больше LOG_SIZE записей и не дольше LOG_TIMEOUT."""
+        three, log = caches['three'], caches['log']
+        log.clear()
+        for number in range(10):
+            three.set('key', number)
+        entries = log.get_many([
+            tiered_cache.LOG_ENTRY_KEY % version for version in range(1, 11)
+        ])
+        self.assertEqual(len(entries), 3)
+        self.assertIsNone(caches['l2_three'].get(tiered_cache.LOG_VERSION_KEY))
+        later = time.time() + 6
+        with mock.patch('time.time', return_value=later):
+            self.assertEqual(log.get_many(list(entries)), {})
+
+    def test_log_does_not_evict_data(self):
+        """Записи журнала не вытесняют из общего кеша горячие ключи."""
+        cache.clear()
+        for _ in range(5):
+            bump_generation()
+        generation = cache.get(GENERATION_KEY)
+        for number in range(400):
+            cache.set(f'unrelated:{number}', number)
+        self.assertEqual(caches['shared'].get(GENERATION_KEY), generation)
+
+
+class CachedSessionTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse('posts:follow_index')
+
+    def session_writes(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return [
+            query['sql'] for query in queries
+            if 'django_session' in query['sql']
+        ]
+
+    def test_expiry_written_behind(self):
+        """Продление сессии не пишет в БД, пока не накопился интервал."""
+        self.assertEqual(self.session_writes(), [])
+        with override_settings(SESSION_EXPIRY_REFRESH=0):
+            writes = self.session_writes()
+        self.assertEqual(len(writes), 1)
+        self.assertIn('UPDATE', writes[0])
+        self.assertIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    def test_user_change_resets_cache(self):
+        """Смена пароля сразу завершает сессии из кеша."""
+        self.client.get(self.url)
+        self.user.set_password('новый-пароль')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+# При DEBUG кеш шаблонов выключен; прогрев проверяем с продакшен-загрузчиком.
+@override_settings(TEMPLATES=[{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.cached.Loader', [
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ]),
+        ],
+    },
+}])
+class WarmUpTest(TestCase):
+    def test_templates_compiled_before_first_request(self):
+        """Прогрев кладёт все шаблоны проекта в кеш загрузчика."""
+        report = warm_up()
+        self.assertGreater(report['compile_templates']['count'], 0)
+        self.assertGreater(report['resolve_urls']['count'], 0)
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertIn('posts/index.html', loader.get_template_cache)
+
+
+class StaticFilesTest(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        overrides = override_settings(STATIC_ROOT=root)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        call_command('collectstatic', interactive=False, verbosity=0)
+        # Список файлов middleware строит при загрузке обработчика.
+        self.client = Client()
+        self.url = staticfiles_storage.url('css/bootstrap.min.css')
+
+    def test_pages_link_hashed_names(self):
+        """Страницы ссылаются на файлы с хешем содержимого в имени."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotEqual(self.url, '/static/css/bootstrap.min.css')
+        self.assertContains(response, self.url)
+
+    def test_gzip_variant_with_immutable_cache(self):
+        """Клиенту с gzip уходит сжатая копия с вечным кешированием."""
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Accept-Encoding', response['Vary'])
+        plain = self.client.get(
+            self.url, HTTP_ACCEPT_ENCODING='gzip;q=0, br'
+        )
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertGreater(
+            int(plain['Content-Length']), int(response['Content-Length'])
+        )
+
+    def test_unhashed_name_revalidated(self):
+        """Имя без хеша кешируется ненадолго и отвечает 304."""
+        response = self.client.get('/static/css/bootstrap.min.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        response = self.client.get(
+            '/static/css/bootstrap.min.css',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+
+class MediaServingTest(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        overrides = override_settings(MEDIA_ROOT=root, MEDIA_ACCEL=None)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        os.makedirs(os.path.join(root, 'posts'))
+        self.data = bytes(range(256)) * 4
+        with open(os.path.join(root, 'posts', 'image.png'), 'wb') as file:
+            file.write(self.data)
+        self.url = reverse('media', args=['posts/image.png'])
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        """Файл целиком отдаётся с валидаторами и поддержкой Range."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(self.body(response), self.data)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_ranges(self):
+        """Диапазон отдаётся ровно по границам, чужой If-Range — весь файл."""
+        cases = {
+            'bytes=10-19': (10, 20),
+            'bytes=1000-': (1000, 1024),
+            'bytes=-5': (1019, 1024),
+            'bytes=1020-5000': (1020, 1024),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.PARTIAL_CONTENT
+                )
+                self.assertEqual(self.body(response), self.data[start:end])
+                self.assertEqual(
+                    response['Content-Range'],
+                    'bytes %d-%d/1024' % (start, end - 1),
+                )
+                self.assertEqual(
+                    int(response['Content-Length']), end - start
+                )
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"other"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_offload_to_front_server(self):
+        """С MEDIA_ACCEL байты отправляет фронтенд-сервер."""
+        with override_settings(MEDIA_ACCEL='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/image.png'
+        )
+        self.assertEqual(response.content, b'')
+        with override_settings(MEDIA_ACCEL='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertTrue(response['X-Sendfile'].endswith('image.png'))
+
+    def test_outside_media_root(self):
+        """Пути за пределами MEDIA_ROOT и каталоги не отдаются."""
+        for path in ('../settings.py', 'posts', 'posts/missing.png'):
+            with self.subTest(path=path):
+                response = self.client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
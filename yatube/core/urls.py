@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('status/tasks/', views.task_status, name='task_status'),
+    path('metrics/', views.metrics_view, name='metrics'),
+]
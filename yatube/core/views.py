@@ -1,4 +1,16 @@
+import hmac
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import PermissionDenied, SuspiciousFileOperation
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.utils._os import safe_join
+from django.views.decorators.http import require_safe
+
+from . import metrics
+from .media import media_response
+from .tasks import task_stats
 
 
 def page_not_found(request, exception):
@@ -15,3 +27,45 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def task_status(request):
+    return JsonResponse(task_stats())
+
+
+def _metrics_allowed(request):
+    if request.user.is_staff:
+        return True
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    scheme, _, credentials = request.META.get(
+        'HTTP_AUTHORIZATION', ''
+    ).partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and (
+        hmac.compare_digest(credentials.encode(), token.encode())
+    )
+
+
+def metrics_view(request):
+    """Метрики в формате Prometheus; доступ — см. METRICS_TOKEN в settings."""
+    if not _metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@require_safe
+def serve_media(request, path):
+    """Файлы MEDIA_ROOT: через фронтенд-сервер или sendfile с Range."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    response = media_response(request, path, full_path)
+    if response is None:
+        raise Http404
+    return response
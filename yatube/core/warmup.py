@@ -0,0 +1,69 @@
+"""Прогрев воркера до первого запроса.
+
+wsgi.py вызывает warm_up() при импорте приложения: шаблоны из
+TEMPLATES_DIR компилируются в кеш загрузчика, URL-шаблоны разбираются
+вместе с импортом всех представлений, соединения с БД открываются.
+Соединения принадлежат потоку и процессу, поэтому сервер должен
+импортировать wsgi.py в каждом воркере, а не в мастере до fork.
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith('.html'):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, directory).replace(os.sep, '/')
+
+
+def compile_templates():
+    compiled = 0
+    for engine in engines.all():
+        for name in template_names(settings.TEMPLATES_DIR):
+            try:
+                engine.get_template(name)
+            except TemplateSyntaxError:
+                logger.exception('Шаблон %s не компилируется', name)
+            else:
+                compiled += 1
+    return compiled
+
+
+def resolve_urls(resolver=None):
+    resolver = resolver or get_resolver()
+    # Разбор наполняет словари reverse и компилирует регулярные выражения;
+    # вложенные пространства имён разбираются отдельно.
+    count = len(resolver.reverse_dict)
+    for _, namespace in resolver.namespace_dict.values():
+        count += resolve_urls(namespace)
+    return count
+
+
+def open_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+    return len(connections.all())
+
+
+def warm_up():
+    """Выполняет шаги прогрева и возвращает их время в миллисекундах."""
+    report = {}
+    for step in (compile_templates, resolve_urls, open_connections):
+        started = time.perf_counter()
+        count = step()
+        report[step.__name__] = {
+            'count': count,
+            'ms': round((time.perf_counter() - started) * 1000, 3),
+        }
+    logger.info('Воркер прогрет: %s', report)
+    return report
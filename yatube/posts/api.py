@@ -0,0 +1,134 @@
+"""JSON API лент и постов только для чтения.
+
+Ответ строится из values_list без создания моделей. ETag зависит от
+поколения лент и полного пути, поэтому 304 отдаётся без запросов к БД.
+"""
+import hashlib
+
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_safe
+
+from yatube.settings import PAGE_COUNT
+
+from .feed_cache import get_generation, get_generation_time
+from .models import Group, Post, User
+from .pagination import CursorPaginator, encode_cursor, get_cursor_page
+
+MAX_LIMIT = 100
+# Ключ в ответе и поле выборки.
+POST_FIELDS = {
+    "id": "id",
+    "text": "text",
+    "pub_date": "pub_date",
+    "author": "author__username",
+    "group": "group__slug",
+    "image": "image",
+    "comments_count": "comments_count",
+}
+JSON_PARAMS = {"ensure_ascii": False, "separators": (",", ":")}
+
+
+def _rows(queryset):
+    return queryset.values_list(*POST_FIELDS.values())
+
+
+def _serialize(values):
+    row = dict(zip(POST_FIELDS, values))
+    row["image"] = default_storage.url(row["image"]) if row["image"] else None
+    return row
+
+
+class RowCursorPaginator(CursorPaginator):
+    """Курсор по кортежам values_list; отдаёт готовые к JSON словари."""
+
+    def cursor_for(self, row):
+        return encode_cursor(row["pub_date"], row["id"])
+
+    def fetch(self, queryset):
+        return [_serialize(values) for values in queryset]
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get("limit", PAGE_COUNT))
+    except ValueError:
+        return PAGE_COUNT
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def _link(request, direction, token):
+    if token is None:
+        return None
+    query = request.GET.copy()
+    query.pop("after", None)
+    query.pop("before", None)
+    query[direction] = token
+    return "%s?%s" % (request.path, query.urlencode())
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params=JSON_PARAMS)
+
+
+def _feed(request, queryset):
+    paginator = RowCursorPaginator(_rows(queryset), _limit(request))
+    page = get_cursor_page(request, paginator)
+    return _json({
+        "results": page.object_list,
+        "next": _link(request, "after", page.next_cursor),
+        "previous": _link(request, "before", page.previous_cursor),
+    })
+
+
+def _not_found():
+    return _json({"detail": "Не найдено."}, status=404)
+
+
+def _etag(request, *args, **kwargs):
+    key = "%s:%s" % (get_generation(), request.get_full_path())
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def _last_modified(request, *args, **kwargs):
+    return get_generation_time()
+
+
+conditional = condition(etag_func=_etag, last_modified_func=_last_modified)
+
+
+@require_safe
+@conditional
+def post_list(request):
+    return _feed(request, Post.objects.all())
+
+
+@require_safe
+@conditional
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        "pk", flat=True
+    ).first()
+    if group_id is None:
+        return _not_found()
+    return _feed(request, Post.objects.filter(group_id=group_id))
+
+
+@require_safe
+@conditional
+def user_posts(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        "pk", flat=True
+    ).first()
+    if author_id is None:
+        return _not_found()
+    return _feed(request, Post.objects.filter(author_id=author_id))
+
+
+@require_safe
+@conditional
+def post_detail(request, post_id):
+    values = _rows(Post.objects.filter(pk=post_id)).first()
+    if values is None:
+        return _not_found()
+    return _json(_serialize(values))
@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import api
+
+app_name = 'api'
+urlpatterns = [
+    path('posts/', api.post_list, name='post_list'),
+    path('posts/<int:post_id>/', api.post_detail, name='post_detail'),
+    path('groups/<slug:slug>/posts/', api.group_posts, name='group_posts'),
+    path('users/<str:username>/posts/', api.user_posts, name='user_posts'),
+]
@@ -0,0 +1,71 @@
+"""Помощники для массовой загрузки строк в обход сигналов моделей."""
+import itertools
+from contextlib import contextmanager
+
+from django.db import connections, router, transaction
+
+
+def batches(rows, size):
+    """Режет поток строк на списки не длиннее size."""
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def insert(model, rows, batch_size, ignore_conflicts=False):
+    """Вставляет строки порциями, каждая порция в своей транзакции."""
+    inserted = 0
+    for batch in batches(rows, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, ignore_conflicts=ignore_conflicts)
+        inserted += len(batch)
+    return inserted
+
+
+def insert_returning_pks(model, objs, batch_size=None):
+    """Вставляет объекты без сигналов и возвращает их новые pk по порядку."""
+    objs = list(objs)
+    using = router.db_for_write(model)
+    connection = connections[using]
+    if connection.features.can_return_ids_from_bulk_insert:
+        model.objects.using(using).bulk_create(objs, batch_size=batch_size)
+        return [obj.pk for obj in objs]
+    if connection.vendor == "sqlite":
+        # bulk_create на SQLite не сообщает id. Первая вставка берёт
+        # блокировку записи до конца транзакции, так что наши строки —
+        # последние len(objs) rowid, выданные по порядку вставки.
+        with transaction.atomic(using=using):
+            model.objects.using(using).bulk_create(
+                objs, batch_size=batch_size
+            )
+            pks = model._base_manager.using(using).order_by(
+                "-pk"
+            ).values_list("pk", flat=True)[:len(objs)]
+            return list(pks)[::-1]
+    # Остальные базы не обещают порядка id: вставляем по строке тем же
+    # путём, что и Model.save(), но без сигналов.
+    fields = [
+        field for field in model._meta.concrete_fields
+        if field is not model._meta.pk
+    ]
+    return [
+        model._base_manager._insert(
+            [obj], fields=fields, return_id=True, using=using
+        )
+        for obj in objs
+    ]
+
+
+@contextmanager
+def manual_dates(*fields):
+    """Даёт bulk_create сохранить заданные даты вместо auto_now_add."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
@@ -0,0 +1,142 @@
+"""Условный GET для страниц поста, профиля и группы.
+
+ETag считается до представления: одна выборка по индексу даёт дату
+последнего поста или комментария, а метка последней правки каждой
+области (пост, автор, группа, имена) хранится в кеше и обновляется
+сигналами. Неизменная страница получает 304 без основных запросов и
+рендеринга. В ETag входят пользователь и CSRF-cookie: от них зависят
+шапка, кнопки и формы на странице; у вошедшего читателя ещё и метка
+его собственной области — его подписки меняют кнопки.
+
+Метки растут, а вытесненная из кеша область получает новую: иначе ETag
+вернулся бы к значению до правки. Last-Modified не отдаётся — в нём
+нет ни пользователя, ни меток, и If-Modified-Since отвечал бы 304 на
+чужую или устаревшую страницу.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from .models import Comment, Group, Post, User
+
+CHANGED_KEY = "posts:changed:%s"
+# Имена пользователей и названия групп видны на всех трёх страницах.
+NAMES = "names"
+
+
+def _scope(kind, pk):
+    return "%s:%s" % (kind, pk)
+
+
+def touch(*scopes):
+    """Обновляет метку правки в областях вида post:1, user:2, group:3."""
+    stamp = time.time_ns()
+    cache.set_many({CHANGED_KEY % scope: stamp for scope in scopes}, None)
+
+
+def touch_post(post_id, author_id, *group_ids):
+    touch(
+        _scope("post", post_id),
+        _scope("user", author_id),
+        *(_scope("group", pk) for pk in set(group_ids) if pk),
+    )
+
+
+def touch_post_by_id(post_id):
+    post = Post.objects.filter(pk=post_id).values_list(
+        "author_id", "group_id"
+    ).first()
+    if post is None:
+        touch(_scope("post", post_id))
+    else:
+        touch_post(post_id, *post)
+
+
+def _latest(queryset, field):
+    return Subquery(queryset.order_by("-" + field).values(field)[:1])
+
+
+def _post_state(post_id):
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=_latest(
+            Comment.objects.filter(post=OuterRef("pk")), "created"
+        )
+    ).values_list("pub_date", "last_comment", "author_id", "group_id").first()
+    if row is None:
+        return None
+    pub_date, last_comment, author_id, group_id = row
+    scopes = [_scope("post", post_id), _scope("user", author_id)]
+    if group_id:
+        scopes.append(_scope("group", group_id))
+    return [pub_date, last_comment], scopes
+
+
+def _profile_state(username):
+    row = User.objects.filter(username=username).annotate(
+        last_post=_latest(
+            Post.objects.filter(author=OuterRef("pk")), "pub_date"
+        )
+    ).values_list("pk", "last_post").first()
+    if row is None:
+        return None
+    return [row[1]], [_scope("user", row[0])]
+
+
+def _group_state(slug):
+    row = Group.objects.filter(slug=slug).annotate(
+        last_post=_latest(
+            Post.objects.filter(group=OuterRef("pk")), "pub_date"
+        )
+    ).values_list("pk", "last_post").first()
+    if row is None:
+        return None
+    return [row[1]], [_scope("group", row[0])]
+
+
+def _changed(scopes):
+    """Метки областей; вытесненные из кеша получают новую метку."""
+    keys = [CHANGED_KEY % scope for scope in scopes]
+    changed = cache.get_many(keys)
+    for key in keys:
+        if key not in changed:
+            cache.add(key, time.time_ns(), None)
+            changed[key] = cache.get(key)
+    return sorted(changed.items())
+
+
+def _etag(request, state_func, lookup):
+    """ETag один раз на запрос; None — пусть решит view."""
+    if not hasattr(request, "_page_etag"):
+        request._page_etag = None
+        state = state_func(lookup)
+        if state is not None:
+            dates, scopes = state
+            scopes.append(NAMES)
+            if request.user.is_authenticated:
+                # Кнопки подписки зависят от подписок самого читателя.
+                scopes.append(_scope("user", request.user.pk))
+            parts = [
+                request.get_full_path(),
+                request.user.pk,
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""),
+                *dates,
+                *_changed(scopes),
+            ]
+            request._page_etag = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return request._page_etag
+
+
+def _page_condition(state_func, argument):
+    def etag(request, *args, **kwargs):
+        return _etag(request, state_func, kwargs[argument])
+
+    return condition(etag_func=etag)
+
+
+post_condition = _page_condition(_post_state, "post_id")
+profile_condition = _page_condition(_profile_state, "username")
+group_condition = _page_condition(_group_state, "slug")
@@ -0,0 +1,117 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, GroupStats, Post, User, UserStats
+
+
+def _count(model, field, distinct=None, **filters):
+    """Подзапрос COUNT строк model, ссылающихся на внешнюю строку.
+
+    distinct — поле, различные значения которого считаются вместо строк.
+    """
+    rows = model.objects.filter(**{field: OuterRef("pk")}, **filters)
+    total = Count(distinct or "pk", distinct=bool(distinct))
+    return Coalesce(
+        Subquery(
+            rows.order_by().values(field).annotate(total=total)
+            .values("total")
+        ),
+        0,
+    )
+
+
+def bump(model, pk, field, delta):
+    """Атомарно сдвигает счётчик на delta, не опуская его ниже нуля."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{field + "__gte": -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    if not bump(UserStats, user_id, field, delta) and delta > 0:
+        # Строки ещё нет: считаем её целиком, новое событие уже в таблице.
+        stats_for(user_id)
+
+
+def stats_for(user_id):
+    """Счётчики пользователя; недостающая строка создаётся подсчётом."""
+    try:
+        return UserStats.objects.get(user_id=user_id)
+    except UserStats.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return UserStats.objects.create(
+                user_id=user_id,
+                posts_count=Post.objects.filter(author_id=user_id).count(),
+                followers_count=Follow.objects.filter(
+                    author_id=user_id
+                ).count(),
+                following_count=Follow.objects.filter(
+                    user_id=user_id
+                ).count(),
+            )
+    except IntegrityError:
+        # Строку создал соседний запрос; реплика могла её ещё не получить.
+        primary = router.db_for_write(UserStats)
+        return UserStats.objects.using(primary).get(user_id=user_id)
+
+
+def rebuild_user_counters(first_pk, last_pk):
+    users = User.objects.filter(pk__gte=first_pk, pk__lte=last_pk)
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in users.values_list("pk", flat=True)),
+        ignore_conflicts=True,
+    )
+    return UserStats.objects.filter(
+        user_id__gte=first_pk, user_id__lte=last_pk
+    ).update(
+        posts_count=_count(Post, "author"),
+        followers_count=_count(Follow, "author"),
+        following_count=_count(Follow, "user"),
+    )
+
+
+def rebuild_group_counters(first_pk, last_pk):
+    return Group.objects.filter(pk__gte=first_pk, pk__lte=last_pk).update(
+        posts_count=_count(Post, "group")
+    )
+
+
+def refresh_group_stats(first_pk, last_pk):
+    """Пересчитывает сводку каталога для групп с id из диапазона."""
+    groups = Group.objects.filter(pk__gte=first_pk, pk__lte=last_pk)
+    GroupStats.objects.bulk_create(
+        (
+            GroupStats(group_id=pk)
+            for pk in groups.values_list("pk", flat=True)
+        ),
+        ignore_conflicts=True,
+    )
+    now = timezone.now()
+    since = now - timedelta(days=settings.GROUP_ACTIVE_DAYS)
+    posts = Post.objects.filter(group=OuterRef("pk"))
+    return GroupStats.objects.filter(
+        group_id__gte=first_pk, group_id__lte=last_pk
+    ).update(
+        posts_count=_count(Post, "group"),
+        authors_count=_count(
+            Post, "group", distinct="author", pub_date__gte=since
+        ),
+        last_post=Subquery(
+            posts.order_by("-pub_date").values("pub_date")[:1]
+        ),
+        refreshed=now,
+    )
+
+
+def rebuild_post_counters(first_pk, last_pk):
+    return Post.objects.filter(pk__gte=first_pk, pk__lte=last_pk).update(
+        comments_count=_count(Comment, "post")
+    )
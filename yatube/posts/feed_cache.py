@@ -0,0 +1,88 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.utils import timezone
+
+from core import metrics
+
+GENERATION_KEY = "posts:generation:feed"
+GENERATION_TIME_KEY = "posts:generation:feed:time"
+FRAGMENTS = ("index", "group", "profile", "follow")
+
+
+def _new_generation():
+    # Пропавшее из кеша поколение не начинается снова с 1: ключи
+    # фрагментов и ETag API прошлых поколений не должны ожить.
+    return time.time_ns()
+
+
+def get_generation():
+    """Поколение лент: меняется при любой правке постов, групп и т.п."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = _new_generation()
+        cache.add(GENERATION_KEY, generation, None)
+        generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+def get_generation_time():
+    """Когда поколение лент менялось в последний раз."""
+    changed = cache.get(GENERATION_TIME_KEY)
+    if changed is None:
+        cache.add(GENERATION_TIME_KEY, timezone.now(), None)
+        changed = cache.get(GENERATION_TIME_KEY, timezone.now())
+    return changed
+
+
+def bump_generation():
+    """Делает недействительными все закешированные фрагменты лент."""
+    generation = _new_generation()
+    if not cache.add(GENERATION_KEY, generation, None):
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.set(GENERATION_KEY, generation, None)
+    cache.set(GENERATION_TIME_KEY, timezone.now(), None)
+    return generation
+
+
+def fragment_key(name, vary_on):
+    return make_template_fragment_key(
+        "feed:%s" % name, [get_generation(), *vary_on]
+    )
+
+
+def get_fragment(name, vary_on):
+    value = cache.get(fragment_key(name, vary_on))
+    metrics.record_cache("feed_fragment", value is not None)
+    metrics.record_fragment(name, value is not None)
+    return value
+
+
+def set_fragment(name, vary_on, value):
+    cache.set(
+        fragment_key(name, vary_on), value, settings.FEED_CACHE_TIMEOUT
+    )
+
+
+def fragment_stats():
+    """Счётчики попаданий и промахов по каждому фрагменту лент.
+
+    Считаются в памяти процесса, а не в общем кеше: запись в общий кеш
+    на каждое чтение ленты сбрасывала бы L1 всех воркеров. Счётчики
+    других воркеров видны через снимки в METRICS_DIR.
+    """
+    values = metrics.collect()
+    return {
+        name: {
+            kind: values.get((
+                metrics.FRAGMENT_METRIC,
+                (("fragment", name), ("result", result)),
+            ), 0)
+            for kind, result in (("hits", "hit"), ("misses", "miss"))
+        }
+        for name in FRAGMENTS
+    }
@@ -1,5 +1,7 @@
 from django import forms
-from .models import Post, Comment
+from django.utils.http import urlencode
+
+from .models import Comment, Group, Post, User
 
 
 class PostForm(forms.ModelForm):
@@ -12,3 +14,32 @@ class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label="Поиск", max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        to_field_name="slug",
+        required=False,
+        label="Группа",
+        widget=forms.TextInput,
+    )
+    author = forms.ModelChoiceField(
+        User.objects.all(),
+        to_field_name="username",
+        required=False,
+        label="Автор",
+        widget=forms.TextInput,
+    )
+
+    def query_string(self):
+        """Параметры поиска для ссылок на соседние страницы."""
+        if not self.is_valid():
+            return ""
+        params = {"q": self.cleaned_data["q"]}
+        if self.cleaned_data["group"]:
+            params["group"] = self.cleaned_data["group"].slug
+        if self.cleaned_data["author"]:
+            params["author"] = self.cleaned_data["author"].username
+        return urlencode(params)
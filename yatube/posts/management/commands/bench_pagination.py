@@ -0,0 +1,74 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from core.benchmark import benchmark_database, measure
+from posts.models import Post
+from posts.pagination import CursorPaginator
+from yatube.settings import PAGE_COUNT
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает OFFSET- и курсорную пагинацию '
+        'на первой и глубокой странице.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--page', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--current', action='store_true',
+            help='Мерить на текущей БД вместо временной.',
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database(use_current=options['current']):
+            if not options['current']:
+                self.fill(options['posts'])
+            report = self.run(options['page'], options['repeat'])
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def fill(self, total):
+        author = User.objects.create_user(username='bench_pagination')
+        batch = 5000
+        for start in range(0, total, batch):
+            Post.objects.bulk_create(
+                Post(author=author, text=f'Пост {number}')
+                for number in range(start, min(start + batch, total))
+            )
+
+    def run(self, deep_page, repeat):
+        posts = Post.objects.all()
+        offset = Paginator(posts, PAGE_COUNT)
+        deep_page = min(deep_page, offset.num_pages)
+        cursor = CursorPaginator(posts, PAGE_COUNT)
+        boundary = cursor.object_list[PAGE_COUNT * (deep_page - 1) - 1]
+        token = cursor.cursor_for(boundary)
+
+        def offset_page(number):
+            # Новый Paginator на каждый вызов, как в представлении.
+            return lambda: list(Paginator(posts, PAGE_COUNT).page(number))
+
+        def cursor_page(after):
+            return lambda: list(
+                CursorPaginator(posts, PAGE_COUNT).get_page(after=after)
+            )
+
+        return {
+            'posts': offset.count,
+            'deep_page': deep_page,
+            'offset': {
+                'page_1': measure(offset_page(1), repeat),
+                'page_deep': measure(offset_page(deep_page), repeat),
+            },
+            'cursor': {
+                'page_1': measure(cursor_page(None), repeat),
+                'page_deep': measure(cursor_page(token), repeat),
+            },
+        }
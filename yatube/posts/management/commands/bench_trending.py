@@ -0,0 +1,102 @@
+import json
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.benchmark import benchmark_database, measure
+from posts.models import Post
+from posts.trending import (
+    add_events, flush_views, rebuild_trending_scores, record_view, top_posts
+)
+
+User = get_user_model()
+
+KINDS = ('comment', 'follow', 'view')
+
+
+class Command(BaseCommand):
+    help = (
+        'Меряет скорость обновления счёта популярности: по одному '
+        'событию, пачками и через буфер просмотров — против полного '
+        'пересчёта. Работает на временной БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--events', type=int, default=20_000)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--top', type=int, default=100)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        with benchmark_database():
+            self.fill(options['posts'])
+            report = self.run(options)
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def fill(self, total):
+        author = User.objects.create_user(username='bench_trending')
+        batch = 5000
+        for start in range(0, total, batch):
+            Post.objects.bulk_create(
+                Post(author=author, text=f'Пост {number}')
+                for number in range(start, min(start + batch, total))
+            )
+        self.last_pk = Post.objects.latest('pk').pk
+        rebuild_trending_scores(1, self.last_pk)
+
+    def events(self, count):
+        now = timezone.now()
+        return [
+            (
+                self.rng.randint(1, self.last_pk),
+                self.rng.choice(KINDS),
+                now,
+                1,
+            )
+            for _ in range(count)
+        ]
+
+    def rate(self, count, func):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        return round(count / elapsed) if elapsed else count
+
+    def run(self, options):
+        total, size = options['events'], options['batch_size']
+        single = self.events(total)
+        batched = self.events(total)
+        views = [event[0] for event in self.events(total)]
+
+        def one_by_one():
+            for event in single:
+                add_events([event])
+
+        def in_batches():
+            for start in range(0, total, size):
+                add_events(batched[start:start + size])
+
+        def buffered_views():
+            for post_id in views:
+                record_view(post_id)
+            flush_views()
+
+        started = time.perf_counter()
+        rebuild_trending_scores(1, self.last_pk)
+        rebuild_ms = (time.perf_counter() - started) * 1000
+        return {
+            'posts': self.last_pk,
+            'events': total,
+            'updates_per_sec': {
+                'single': self.rate(total, one_by_one),
+                'batched': self.rate(total, in_batches),
+                'buffered_views': self.rate(total, buffered_views),
+            },
+            'full_rebuild_ms': round(rebuild_ms, 3),
+            'top_k': measure(lambda: list(top_posts(options['top']))),
+        }
@@ -0,0 +1,93 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Follow, Group, Post
+
+# Тип записи, модель и поля; пользователи и группы выгружаются
+# естественными ключами, чтобы импорт не зависел от их id.
+STREAMS = (
+    ('group', Group, {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+    }),
+    ('post', Post, {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    }),
+    ('comment', Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }),
+    ('follow', Follow, {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+)
+PROGRESS_EVERY = 50_000
+
+
+def _json_default(value):
+    # DjangoJSONEncoder обрезает микросекунды, а даты нужны точно.
+    return value.isoformat()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает группы, посты, комментарии и подписки в JSONL '
+        'потоком, не загружая таблицы в память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл для выгрузки; по умолчанию stdout.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        to_stdout = options['output'] == '-'
+        # Прогресс не должен смешиваться с данными в stdout.
+        self.progress = self.stderr if to_stdout else self.stdout
+        if to_stdout:
+            self.export(sys.stdout, options['chunk_size'])
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                self.export(output, options['chunk_size'])
+
+    def export(self, output, chunk_size):
+        started = time.perf_counter()
+        total = 0
+        for kind, model, fields in STREAMS:
+            rows = model.objects.order_by('pk').values_list(*fields.values())
+            names = list(fields)
+            for values in rows.iterator(chunk_size=chunk_size):
+                record = dict(zip(names, values))
+                record['model'] = kind
+                output.write(
+                    json.dumps(
+                        record, ensure_ascii=False, default=_json_default
+                    ) + '\n'
+                )
+                total += 1
+                if total % PROGRESS_EVERY == 0:
+                    self.report(total, started)
+        self.report(total, started)
+
+    def report(self, total, started):
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else total
+        self.progress.write(
+            f'выгружено {total} строк за {elapsed:.1f} с ({rate:.0f} строк/с)'
+        )
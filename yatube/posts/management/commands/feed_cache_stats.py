@@ -0,0 +1,16 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from posts.feed_cache import fragment_stats, get_generation
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кеша фрагментов лент.'
+
+    def handle(self, *args, **options):
+        report = {
+            'generation': get_generation(),
+            'fragments': fragment_stats(),
+        }
+        self.stdout.write(json.dumps(report, indent=2))
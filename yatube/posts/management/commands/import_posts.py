@@ -0,0 +1,296 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import insert_returning_pks, manual_dates
+from posts.conditional import NAMES, touch
+from posts.feed_cache import bump_generation
+from posts.models import Comment, Follow, Group, ImportedRow, Post
+from posts.search import index_posts
+from posts.timeline import rebuild_timelines
+from posts.trending import add_events, event_score
+
+User = get_user_model()
+
+
+def fingerprint(path):
+    """Ключ выгрузки в таблице соответствия id: хеш содержимого файла."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает JSONL из export_posts порциями. Авторы сопоставляются '
+        'по username, недостающие создаются без пароля; посты, комментарии '
+        'и подписки получают новые id, связи восстанавливаются по таблице '
+        'соответствия. После обрыва повторный запуск продолжает с последней '
+        'сохранённой порции и не дублирует строки. Файлы картинок не '
+        'переносятся, только имена.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с начала файла, игнорируя сохранённый прогресс.',
+        )
+        parser.add_argument(
+            '--search-index', action='store_true',
+            help='Индексировать загруженные посты для поиска.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['input']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден.')
+        self.checkpoint = path + '.checkpoint'
+        self.source = fingerprint(path)
+        self.search_index = options['search_index']
+        self.groups = {}
+        self.skipped = Counter()
+        self.scopes = set()
+        offset, total = 0, 0
+        if not options['restart'] and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as checkpoint:
+                state = json.load(checkpoint)
+            offset, total = state['offset'], state['rows']
+            self.stdout.write(f'Продолжаем с {total} строки.')
+        self.started = time.perf_counter()
+        self.loaded = 0
+        with open(path, 'rb') as source:
+            source.seek(offset)
+            kind, pending = None, []
+            for line in source:
+                record = json.loads(line) if line.strip() else None
+                if pending and record and (
+                    record['model'] != kind
+                    or len(pending) == options['batch_size']
+                ):
+                    total = self.load(kind, pending, offset, total)
+                    pending = []
+                offset += len(line)
+                if record:
+                    kind = record['model']
+                    pending.append(record)
+            if pending:
+                total = self.load(kind, pending, offset, total)
+        for (kind, reason), count in sorted(self.skipped.items()):
+            self.stdout.write(f'{kind}: пропущено {count} ({reason})')
+        self.stdout.write('Пересчёт счётчиков и лент...')
+        call_command(
+            'rebuild_counters', chunk_size=options['batch_size'],
+            stdout=self.stdout,
+        )
+        rebuild_timelines(options['batch_size'])
+        if os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.stdout.write(f'Готово: {total} строк.')
+
+    def load(self, kind, records, offset, total):
+        """Загружает порцию одного типа и сохраняет прогресс после коммита."""
+        loader = getattr(self, 'load_' + kind, None)
+        if loader is None:
+            raise CommandError(f'Неизвестный тип записи: {kind}')
+        with transaction.atomic():
+            loader(records)
+        # Строки вставлены без сигналов, а загруженные даты обычно старше
+        # уже видимых: без этого ETag страниц не поменялся бы.
+        if self.scopes:
+            touch(*self.scopes)
+            self.scopes.clear()
+        bump_generation()
+        total += len(records)
+        self.loaded += len(records)
+        temporary = self.checkpoint + '.tmp'
+        with open(temporary, 'w') as checkpoint:
+            json.dump({'offset': offset, 'rows': total}, checkpoint)
+        os.replace(temporary, self.checkpoint)
+        elapsed = time.perf_counter() - self.started
+        rate = self.loaded / elapsed if elapsed else self.loaded
+        self.stdout.write(
+            f'{kind}: загружено {total} строк ({rate:.0f} строк/с)'
+        )
+        return total
+
+    def user_ids(self, usernames):
+        usernames = set(usernames) - {None}
+        found = dict(
+            User.objects.filter(username__in=usernames).values_list(
+                'username', 'pk'
+            )
+        )
+        missing = usernames - found.keys()
+        if missing:
+            User.objects.bulk_create(
+                (
+                    User(username=username, password=make_password(None))
+                    for username in missing
+                ),
+                ignore_conflicts=True,
+            )
+            found.update(
+                User.objects.filter(username__in=missing).values_list(
+                    'username', 'pk'
+                )
+            )
+            self.scopes.add(NAMES)
+        return found
+
+    def group_ids(self, slugs):
+        # Групп на порядки меньше, чем постов: держим их все в памяти.
+        missing = set(slugs) - self.groups.keys() - {None}
+        if missing:
+            self.groups.update(
+                Group.objects.filter(slug__in=missing).values_list(
+                    'slug', 'pk'
+                )
+            )
+        return self.groups
+
+    def imported(self, kind, source_ids):
+        """Id в выгрузке → id у нас для уже загруженных строк."""
+        return dict(
+            ImportedRow.objects.filter(
+                source=self.source, kind=kind,
+                source_id__in=set(source_ids) - {None},
+            ).values_list('source_id', 'target_id')
+        )
+
+    def remember(self, kind, source_ids, target_ids):
+        ImportedRow.objects.bulk_create(
+            ImportedRow(
+                source=self.source, kind=kind,
+                source_id=source_id, target_id=target_id,
+            )
+            for source_id, target_id in zip(source_ids, target_ids)
+        )
+
+    def fresh(self, kind, records):
+        """Записи, которых ещё нет в базе; остальные идут в отчёт."""
+        done = self.imported(kind, (record['id'] for record in records))
+        self.skip(kind, 'уже загружены', len(done))
+        return [record for record in records if record['id'] not in done]
+
+    def skip(self, kind, reason, count=1):
+        if count:
+            self.skipped[(kind, reason)] += count
+
+    def load_group(self, records):
+        slugs = {record['slug'] for record in records}
+        existing = set(
+            Group.objects.filter(slug__in=slugs).values_list(
+                'slug', flat=True
+            )
+        )
+        # Группа с тем же slug уже есть: посты выгрузки попадут в неё.
+        self.skip('group', 'slug уже занят', len(existing))
+        self.scopes.add(NAMES)
+        Group.objects.bulk_create(
+            Group(
+                slug=record['slug'],
+                title=record['title'],
+                description=record['description'],
+            )
+            for record in records
+            if record['slug'] not in existing
+        )
+
+    def load_post(self, records):
+        records = self.fresh('post', records)
+        authors = self.user_ids(record['author'] for record in records)
+        groups = self.group_ids(record['group'] for record in records)
+        posts = []
+        for record in records:
+            pub_date = parse_datetime(record['pub_date'])
+            posts.append(Post(
+                author_id=authors[record['author']],
+                group_id=groups.get(record['group']),
+                text=record['text'],
+                pub_date=pub_date,
+                image=record['image'],
+                # Сигналы не срабатывают: начальный счёт ставим сами.
+                trend_score=event_score('post', pub_date),
+            ))
+        with manual_dates(Post._meta.get_field('pub_date')):
+            ids = insert_returning_pks(Post, posts)
+        self.remember('post', (record['id'] for record in records), ids)
+        self.scopes.update(f'user:{post.author_id}' for post in posts)
+        self.scopes.update(
+            f'group:{post.group_id}' for post in posts if post.group_id
+        )
+        if self.search_index:
+            index_posts(ids)
+
+    def load_comment(self, records):
+        records = self.fresh('comment', records)
+        posts = self.imported('post', (record['post'] for record in records))
+        loaded = []
+        for record in records:
+            if record['post'] is not None and record['post'] not in posts:
+                self.skip('comment', 'пост не загружен')
+            else:
+                loaded.append(record)
+        authors = self.user_ids(record['author'] for record in loaded)
+        with manual_dates(Comment._meta.get_field('created')):
+            ids = insert_returning_pks(Comment, (
+                Comment(
+                    post_id=posts.get(record['post']),
+                    author_id=authors.get(record['author']),
+                    text=record['text'],
+                    created=parse_datetime(record['created']),
+                )
+                for record in loaded
+            ))
+        self.remember('comment', (record['id'] for record in loaded), ids)
+        self.scopes.update(
+            f'post:{posts[record["post"]]}'
+            for record in loaded if record['post'] is not None
+        )
+        # Популярность считается только для новых постов: rebuild_trending
+        # стёр бы подписки и просмотры по всему сайту.
+        add_events(
+            (posts[record['post']], 'comment',
+             parse_datetime(record['created']), 1)
+            for record in loaded
+            if record['post'] is not None
+        )
+
+    def load_follow(self, records):
+        users = self.user_ids(
+            name
+            for record in records
+            for name in (record['user'], record['author'])
+        )
+        pairs = {
+            (users[record['user']], users[record['author']])
+            for record in records
+        }
+        existing = set(
+            Follow.objects.filter(
+                user_id__in={user for user, _ in pairs},
+                author_id__in={author for _, author in pairs},
+            ).values_list('user_id', 'author_id')
+        )
+        self.skip('follow', 'подписка уже есть', len(pairs & existing))
+        self.skip('follow', 'повтор в выгрузке', len(records) - len(pairs))
+        Follow.objects.bulk_create(
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id, author_id in pairs - existing
+        )
+        self.scopes.update(
+            f'user:{pk}' for pair in pairs - existing for pk in pair
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.counters import (
+    rebuild_group_counters, rebuild_post_counters, rebuild_user_counters,
+    refresh_group_stats,
+)
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики порциями по id.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk = options['chunk_size']
+        targets = (
+            ('пользователи', User, rebuild_user_counters),
+            ('группы', Group, rebuild_group_counters),
+            ('сводка групп', Group, refresh_group_stats),
+            ('посты', Post, rebuild_post_counters),
+        )
+        for title, model, rebuild in targets:
+            last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            updated = 0
+            for first_pk in range(1, last_pk + 1, chunk):
+                with transaction.atomic():
+                    updated += rebuild(first_pk, first_pk + chunk - 1)
+            self.stdout.write(f'{title}: обновлено {updated}')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import Post
+from posts.search import index_posts
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.order_by('pk').values_list('pk', flat=True)
+        indexed = 0
+        chunk = []
+        for post_id in post_ids.iterator(chunk_size=options['chunk_size']):
+            chunk.append(post_id)
+            if len(chunk) == options['chunk_size']:
+                indexed += self.index_chunk(chunk)
+                chunk = []
+        indexed += self.index_chunk(chunk)
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
+
+    def index_chunk(self, post_ids):
+        with transaction.atomic():
+            return index_posts(post_ids)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.models import Post
+from posts.trending import rebuild_trending_scores
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счёт популярности постов с нуля порциями по id. '
+        'Вклад подписок и просмотров при этом теряется: запускать только '
+        'после смены TRENDING_WEIGHTS или TRENDING_HALF_LIFE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk = options['chunk_size']
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        updated = 0
+        for first_pk in range(1, last_pk + 1, chunk):
+            with transaction.atomic():
+                updated += rebuild_trending_scores(
+                    first_pk, first_pk + chunk - 1
+                )
+        self.stdout.write(f'популярность: обновлено {updated}')
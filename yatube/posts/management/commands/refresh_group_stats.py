@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.counters import refresh_group_stats
+from posts.models import Group
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает сводку каталога групп порциями по id. '
+        'Запускается по расписанию, например раз в пять минут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        chunk = options['chunk_size']
+        started = time.perf_counter()
+        last_pk = Group.objects.aggregate(last=Max('pk'))['last'] or 0
+        updated = 0
+        for first_pk in range(1, last_pk + 1, chunk):
+            with transaction.atomic():
+                updated += refresh_group_stats(first_pk, first_pk + chunk - 1)
+        self.stdout.write(
+            f'группы: обновлено {updated} '
+            f'за {time.perf_counter() - started:.2f} с'
+        )
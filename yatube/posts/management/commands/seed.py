@@ -0,0 +1,289 @@
+import io
+import random
+import time
+from bisect import bisect
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from posts.bulk import batches, insert, manual_dates
+from posts.counters import (
+    rebuild_group_counters, rebuild_post_counters, rebuild_user_counters
+)
+from posts.feed_cache import bump_generation
+from posts.models import Comment, Follow, Group, Post
+from posts.search import index_posts
+from posts.timeline import rebuild_timelines
+from posts.trending import rebuild_trending_scores
+
+User = get_user_model()
+
+WORDS = (
+    'кот собака дом город лес река море утро вечер ночь день год неделя '
+    'друг книга музыка фильм дорога поезд самолёт погода солнце дождь снег '
+    'работа проект код сервер база запрос ответ ошибка тест релиз команда '
+    'идея план отпуск праздник кофе чай завтрак ужин прогулка парк сад '
+    'фото картина история новость вопрос совет мечта путь время жизнь '
+    'python django sql cache index latency'
+).split()
+IMAGE_POOL = 16
+
+
+class Zipf:
+    """Выбор ранга 0..n-1 с вероятностью ~ 1 / (ранг + 1) ** exponent."""
+
+    def __init__(self, n, exponent, rng):
+        self.rng = rng
+        total = 0.0
+        self.cum_weights = []
+        for rank in range(n):
+            total += 1 / (rank + 1) ** exponent
+            self.cum_weights.append(total)
+        self.total = total
+
+    def __call__(self):
+        return bisect(self.cum_weights, self.rng.random() * self.total)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД синтетическими пользователями, группами, постами, '
+        'комментариями и подписками со степенным распределением активности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=500_000)
+        parser.add_argument('--follows', type=int, default=200_000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель степенного закона для авторов, групп и постов.',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов со сгенерированной картинкой, от 0 до 1.',
+        )
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--prefix', default='seed')
+        parser.add_argument(
+            '--password',
+            help='Общий пароль пользователей; по умолчанию вход закрыт.',
+        )
+        parser.add_argument(
+            '--search-index', action='store_true',
+            help='Сразу строить поисковый индекс: ~20 строк на пост.',
+        )
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Не собирать ленты подписок.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        if not 0 <= options['images'] <= 1:
+            raise CommandError('--images задаётся долей от 0 до 1.')
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом «{prefix}» уже есть, '
+                'укажите другой --prefix.'
+            )
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+        # Частоты слов в тексте тоже подчиняются закону Ципфа.
+        self.word_weights = Zipf(len(WORDS), 1.0, self.rng).cum_weights
+
+        users = self.phase('пользователи', self.create_users, options)
+        groups = self.phase('группы', self.create_groups, options)
+        posts = self.phase(
+            'посты', self.create_posts, options, users, groups
+        )
+        self.phase('комментарии', self.create_comments, options, users, posts)
+        self.phase('подписки', self.create_follows, options, users)
+        self.phase('счётчики', self.rebuild_counters)
+        if not options['skip_timelines']:
+            self.phase('ленты', rebuild_timelines, self.batch_size)
+        bump_generation()
+
+    def phase(self, title, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        rows = len(result) if isinstance(result, list) else result
+        rate = rows / elapsed if elapsed else rows
+        self.stdout.write(
+            f'{title}: {rows} строк за {elapsed:.1f} с ({rate:.0f} строк/с)'
+        )
+        return result
+
+    def insert(self, model, rows):
+        return insert(model, rows, self.batch_size)
+
+    def new_pks(self, model, last_pk):
+        return list(
+            model.objects.filter(pk__gt=last_pk or 0)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+    def create_users(self, options):
+        # Хеш считается один раз: PBKDF2 на каждого занял бы минуты.
+        password = make_password(options['password'])
+        last_pk = User.objects.aggregate(last=Max('pk'))['last']
+        prefix = options['prefix']
+        self.insert(
+            User,
+            (
+                User(
+                    username=f'{prefix}{number}',
+                    first_name=f'Автор {number}',
+                    password=password,
+                )
+                for number in range(options['users'])
+            ),
+        )
+        return self.new_pks(User, last_pk)
+
+    def create_groups(self, options):
+        last_pk = Group.objects.aggregate(last=Max('pk'))['last']
+        prefix = options['prefix']
+        self.insert(
+            Group,
+            (
+                Group(
+                    title=f'Группа {number}',
+                    slug=f'{prefix}-{number}',
+                    description=self.text(5, 30),
+                )
+                for number in range(options['groups'])
+            ),
+        )
+        return self.new_pks(Group, last_pk)
+
+    def create_posts(self, options, users, groups):
+        total = options['posts']
+        authors = Zipf(len(users), self.skew, self.rng)
+        topics = Zipf(len(groups), self.skew, self.rng) if groups else None
+        images = self.image_pool() if options['images'] else []
+        first_pk = last_pk = Post.objects.aggregate(last=Max('pk'))['last']
+
+        def rows():
+            for number in range(total):
+                post = Post(
+                    author_id=users[authors()],
+                    text=self.text(8, 60),
+                    pub_date=self.post_date(number, total),
+                )
+                if topics and self.rng.random() < 0.8:
+                    post.group_id = groups[topics()]
+                if images and self.rng.random() < options['images']:
+                    post.image = self.rng.choice(images)
+                yield post
+
+        with manual_dates(Post._meta.get_field('pub_date')):
+            for batch in batches(rows(), self.batch_size):
+                with transaction.atomic():
+                    Post.objects.bulk_create(batch)
+                    if options['search_index']:
+                        new_pks = self.new_pks(Post, last_pk)
+                        index_posts(new_pks)
+                        last_pk = new_pks[-1]
+        return self.new_pks(Post, first_pk)
+
+    def create_comments(self, options, users, posts):
+        if not posts:
+            return 0
+        authors = Zipf(len(users), self.skew, self.rng)
+        # Самые обсуждаемые — свежие посты.
+        targets = Zipf(len(posts), self.skew, self.rng)
+        total_posts = len(posts)
+
+        def rows():
+            for _ in range(options['comments']):
+                index = total_posts - 1 - targets()
+                posted = self.post_date(index, total_posts)
+                yield Comment(
+                    post_id=posts[index],
+                    author_id=users[authors()],
+                    text=self.text(3, 25),
+                    created=posted + (self.now - posted) * self.rng.random(),
+                )
+
+        with manual_dates(Comment._meta.get_field('created')):
+            return self.insert(Comment, rows())
+
+    def create_follows(self, options, users):
+        total = min(options['follows'], len(users) * (len(users) - 1))
+        authors = Zipf(len(users), self.skew, self.rng)
+        # В Follow нет уникального ограничения, поэтому пары помним сами.
+        seen = set()
+
+        def rows():
+            while len(seen) < total:
+                user_id = self.rng.choice(users)
+                author_id = users[authors()]
+                pair = (user_id, author_id)
+                if user_id == author_id or pair in seen:
+                    continue
+                seen.add(pair)
+                yield Follow(user_id=user_id, author_id=author_id)
+
+        return self.insert(Follow, rows())
+
+    def rebuild_counters(self):
+        updated = 0
+        targets = (
+            (User, rebuild_user_counters),
+            (Group, rebuild_group_counters),
+            (Post, rebuild_post_counters),
+            (Post, rebuild_trending_scores),
+        )
+        for model, rebuild in targets:
+            last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            chunk = self.batch_size
+            for first_pk in range(1, last_pk + 1, chunk):
+                with transaction.atomic():
+                    updated += rebuild(first_pk, first_pk + chunk - 1)
+        return updated
+
+    def post_date(self, number, total):
+        """Даты растут вместе с pk и равномерно покрывают --days."""
+        return self.now - self.span * (1 - (number + 1) / total)
+
+    def text(self, shortest, longest):
+        words = self.rng.choices(
+            WORDS,
+            cum_weights=self.word_weights,
+            k=self.rng.randint(shortest, longest),
+        )
+        return ' '.join(words).capitalize() + '.'
+
+    def image_pool(self):
+        """Несколько однотонных картинок, общих для всех постов."""
+        names = []
+        for number in range(IMAGE_POOL):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            buffer = io.BytesIO()
+            Image.new('RGB', (960, 540), color).save(buffer, 'PNG')
+            names.append(
+                default_storage.save(
+                    f'posts/seed-{number}.png', ContentFile(buffer.getvalue())
+                )
+            )
+        return names
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:23
+
+import math
+from datetime import datetime
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_scores(apps, schema_editor):
+    # Начальный счёт — сам пост, как в posts.trending.event_score;
+    # комментарии добавит rebuild_trending.
+    Post = apps.get_model('posts', 'Post')
+    epoch = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    rate = math.log(2) / settings.TRENDING_HALF_LIFE
+    base = math.log(settings.TRENDING_WEIGHTS['post'])
+    posts = Post.objects.order_by('pk').values_list('pk', 'pub_date')
+    batch = []
+    for pk, pub_date in posts.iterator():
+        score = base + (pub_date - epoch).total_seconds() * rate
+        batch.append(Post(pk=pk, trend_score=score))
+        if len(batch) == 500:
+            Post.objects.bulk_update(batch, ['trend_score'])
+            batch = []
+    Post.objects.bulk_update(batch, ['trend_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_groupstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='trend_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-trend_score', '-id'], name='post_trend_score_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
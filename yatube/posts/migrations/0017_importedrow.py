@@ -0,0 +1,31 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_post_trend_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportedRow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=40, verbose_name='Выгрузка')),
+                ('kind', models.CharField(max_length=16, verbose_name='Тип записи')),
+                ('source_id', models.PositiveIntegerField(verbose_name='Id в выгрузке')),
+                ('target_id', models.PositiveIntegerField(verbose_name='Id у нас')),
+            ],
+            options={
+                'verbose_name': 'Загруженная строка',
+                'verbose_name_plural': 'Загруженные строки',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='importedrow',
+            constraint=models.UniqueConstraint(fields=('source', 'kind', 'source_id'), name='imported_row_source_unique'),
+        ),
+    ]
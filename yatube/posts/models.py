@@ -21,11 +21,20 @@ class Group(models.Model):
     description = models.TextField(
         verbose_name="Описание группы", help_text="Тематика группы"
     )
+    posts_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Число постов"
+    )
 
     def __str__(self):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты со всем, что шаблоны лент читают по внешним ключам."""
+        return self.select_related("author", "group")
+
+
 class Post(models.Model):
     group = models.ForeignKey(
         Group,
@@ -54,9 +63,34 @@ class Post(models.Model):
         help_text="Автор поста",
     )
     image = models.ImageField("Картинка", upload_to="posts/", blank=True)
+    comments_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name="Число комментариев"
+    )
+    # Логарифм затухающего счёта, см. posts.trending.
+    trend_score = models.FloatField(
+        default=0, editable=False, verbose_name="Популярность"
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "-id"], name="post_pub_date_id_idx"
+            ),
+            models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="post_author_pub_date_idx",
+            ),
+            models.Index(
+                fields=["group", "-pub_date", "-id"],
+                name="post_group_pub_date_idx",
+            ),
+            models.Index(
+                fields=["-trend_score", "-id"], name="post_trend_score_idx"
+            ),
+        ]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
 
@@ -86,6 +120,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            models.Index(
+                fields=["post", "-created", "-id"],
+                name="comment_post_created_idx",
+            ),
+        ]
         verbose_name = "Комментарий"
         verbose_name_plural = "Комментарии"
 
@@ -104,3 +144,202 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="following",
     )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["user", "author"], name="follow_user_author_idx"
+            ),
+        ]
+
+
+class CreditedFollow(models.Model):
+    """Подписка, уже засчитанная в популярное.
+
+    Переживает отписку: повторная подписка на того же автора счёт
+    его поста больше не поднимает.
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+"
+    )
+    author = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="+"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "author"], name="credited_follow_unique"
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые обновляются сигналами."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Пользователь",
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name="Число постов"
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, verbose_name="Число подписчиков"
+    )
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name="Число подписок"
+    )
+
+    class Meta:
+        verbose_name = "Счётчики пользователя"
+        verbose_name_plural = "Счётчики пользователей"
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class GroupStats(models.Model):
+    """Сводка по группе для каталога; пересчитывается периодически."""
+
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+        verbose_name="Группа",
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name="Число постов"
+    )
+    authors_count = models.PositiveIntegerField(
+        default=0, verbose_name="Активных авторов"
+    )
+    last_post = models.DateTimeField(
+        null=True, blank=True, verbose_name="Последний пост"
+    )
+    refreshed = models.DateTimeField(
+        null=True, blank=True, verbose_name="Пересчитано"
+    )
+
+    class Meta:
+        verbose_name = "Сводка группы"
+        verbose_name_plural = "Сводки групп"
+        indexes = [
+            models.Index(
+                fields=["-posts_count", "-group"],
+                name="group_stats_posts_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.group_id)
+
+
+class TimelineEntry(models.Model):
+    """Готовая строка ленты подписок: пост автора у одного подписчика."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="timeline",
+        verbose_name="Подписчик",
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="timeline_entries",
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор поста",
+    )
+    pub_date = models.DateTimeField(verbose_name="Дата публикации")
+
+    class Meta:
+        ordering = ("-pub_date", "-post")
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "post"], name="timeline_user_post_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["user", "-pub_date", "-post"],
+                name="timeline_user_feed_idx",
+            ),
+            models.Index(
+                fields=["user", "author"], name="timeline_user_author_idx"
+            ),
+        ]
+
+
+class SearchToken(models.Model):
+    """Строка инвертированного индекса: терм поста и его вес."""
+
+    token = models.CharField(max_length=64, verbose_name="Терм")
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name="search_tokens",
+        verbose_name="Пост",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор поста",
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name="+",
+        verbose_name="Группа",
+    )
+    weight = models.PositiveIntegerField(verbose_name="Вес")
+
+    class Meta:
+        verbose_name = "Терм поиска"
+        verbose_name_plural = "Термы поиска"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["token", "post"], name="search_token_post_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["token", "group"], name="search_token_group_idx"
+            ),
+            models.Index(
+                fields=["token", "author"], name="search_token_author_idx"
+            ),
+        ]
+
+
+class ImportedRow(models.Model):
+    """Строка, загруженная import_posts: её id в выгрузке и у нас."""
+
+    source = models.CharField(max_length=40, verbose_name="Выгрузка")
+    kind = models.CharField(max_length=16, verbose_name="Тип записи")
+    source_id = models.PositiveIntegerField(verbose_name="Id в выгрузке")
+    target_id = models.PositiveIntegerField(verbose_name="Id у нас")
+
+    class Meta:
+        verbose_name = "Загруженная строка"
+        verbose_name_plural = "Загруженные строки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "kind", "source_id"],
+                name="imported_row_source_unique",
+            ),
+        ]
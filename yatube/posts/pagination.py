@@ -0,0 +1,183 @@
+import base64
+import binascii
+import json
+import math
+from datetime import datetime
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from yatube.settings import PAGE_COUNT
+
+
+def _json_default(value):
+    # DjangoJSONEncoder режет микросекунды, а курсору нужна точная дата.
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(repr(value))
+
+
+def encode_cursor(key, pk):
+    """Упаковывает пару (ключ сортировки, id) в непрозрачный токен."""
+    raw = json.dumps([key, pk], default=_json_default).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# Типы ключа сортировки по внутреннему типу поля; остальные — int.
+KEY_TYPES = {"DateTimeField": datetime, "FloatField": float}
+# Целые вне диапазона SQLite INTEGER база не примет.
+INT_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+def _is_int(value):
+    return (
+        isinstance(value, int) and not isinstance(value, bool)
+        and value in INT_RANGE
+    )
+
+
+def _decode_key(key, key_type):
+    if key_type is datetime:
+        if not isinstance(key, str):
+            return None
+        try:
+            return parse_datetime(key)
+        except ValueError:
+            return None
+    if key_type is float:
+        if _is_int(key) or (
+            isinstance(key, float) and math.isfinite(key)
+        ):
+            return float(key)
+        return None
+    return key if _is_int(key) else None
+
+
+def decode_cursor(token, key_type=datetime):
+    """Распаковывает токен курсора, для битого токена возвращает None.
+
+    Ключ должен быть того же типа, что поле сортировки (key_type):
+    подделанный токен открывает начало ленты, а не роняет запрос.
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        return None
+    if not _is_int(pk):
+        return None
+    key = _decode_key(key, key_type)
+    if key is None:
+        return None
+    return key, pk
+
+
+class CursorPage(Page):
+    """Страница курсорной пагинации: знает соседей, но не свой номер."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return "<CursorPage of %s>" % len(self.object_list)
+
+    def has_next(self):
+        return self._has_next and bool(self.object_list)
+
+    def has_previous(self):
+        return self._has_previous and bool(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if not self.has_next():
+            return None
+        return self.paginator.cursor_for(self.object_list[-1])
+
+    @property
+    def previous_cursor(self):
+        if not self.has_previous():
+            return None
+        return self.paginator.cursor_for(self.object_list[0])
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по (key_field, id) в порядке убывания.
+
+    Каждая страница — один запрос с LIMIT per_page + 1 по индексу,
+    без COUNT(*) и OFFSET, поэтому глубина страницы не влияет на цену.
+    """
+
+    def __init__(self, object_list, per_page, key_field="pub_date",
+                 pk_field="pk"):
+        self.key_field = key_field
+        self.pk_field = pk_field
+        object_list = object_list.order_by("-" + key_field, "-" + pk_field)
+        super().__init__(object_list, per_page)
+
+    @property
+    def key_type(self):
+        query = self.object_list.query
+        if self.key_field in query.annotations:
+            field = query.annotations[self.key_field].output_field
+        else:
+            field = self.object_list.model._meta.get_field(self.key_field)
+        return KEY_TYPES.get(field.get_internal_type(), int)
+
+    def cursor_for(self, obj):
+        return encode_cursor(getattr(obj, self.key_field), obj.pk)
+
+    def fetch(self, queryset):
+        return list(queryset)
+
+    def _after(self, key, pk):
+        key_field, pk_field = self.key_field, self.pk_field
+        # Внешнее условие <= даёт SQLite границу диапазона по индексу,
+        # иначе OR превращает поиск в сканирование с начала ленты.
+        return self.object_list.filter(
+            Q(**{key_field + "__lte": key}),
+            Q(**{key_field + "__lt": key}) | Q(**{pk_field + "__lt": pk}),
+        )
+
+    def _before(self, key, pk):
+        key_field, pk_field = self.key_field, self.pk_field
+        return self.object_list.filter(
+            Q(**{key_field + "__gte": key}),
+            Q(**{key_field + "__gt": key}) | Q(**{pk_field + "__gt": pk}),
+        ).order_by(key_field, pk_field)
+
+    def get_page(self, after=None, before=None):
+        per_page = self.per_page
+        cursor = decode_cursor(before, self.key_type) if before else None
+        if cursor is not None:
+            rows = self.fetch(self._before(*cursor)[:per_page + 1])
+            has_previous = len(rows) > per_page
+            rows = rows[:per_page][::-1]
+            return CursorPage(rows, self, True, has_previous)
+        cursor = decode_cursor(after, self.key_type) if after else None
+        if cursor is not None:
+            rows = self.fetch(self._after(*cursor)[:per_page + 1])
+            has_next = len(rows) > per_page
+            return CursorPage(rows[:per_page], self, has_next, True)
+        rows = self.fetch(self.object_list[:per_page + 1])
+        has_next = len(rows) > per_page
+        return CursorPage(rows[:per_page], self, has_next, False)
+
+
+def paginate(request, queryset, per_page=PAGE_COUNT, key_field="pub_date"):
+    """Старые ссылки ?page=N работают через OFFSET, остальные — курсором."""
+    if "page" in request.GET:
+        paginator = Paginator(queryset, per_page)
+        return paginator.get_page(request.GET.get("page"))
+    paginator = CursorPaginator(queryset, per_page, key_field=key_field)
+    return get_cursor_page(request, paginator)
+
+
+def get_cursor_page(request, paginator):
+    return paginator.get_page(
+        after=request.GET.get("after"), before=request.GET.get("before")
+    )
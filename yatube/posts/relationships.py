@@ -0,0 +1,71 @@
+"""Подписки пользователя запроса на авторов: один запрос на страницу.
+
+Ленты кешируются фрагментами, общими для всех читателей, поэтому кнопка
+подписки внутри фрагмента — метка, которую FeedCacheNode после выборки
+из кеша заменяет кнопкой для текущего пользователя.
+"""
+import re
+
+from django.template.loader import render_to_string
+
+from .models import Follow
+
+FOLLOW_MARKER = "<!--follow-button:%d:%s-->"
+FOLLOW_MARKER_RE = re.compile(r"<!--follow-button:(\d+):([\w.@+-]+)-->")
+
+
+class FollowState:
+    """На кого из авторов подписан пользователь; ответы запоминаются."""
+
+    def __init__(self, user):
+        self.user = user
+        self.known = {}
+
+    def following(self, author_ids):
+        """Подмножество author_ids, на которое подписан пользователь."""
+        author_ids = set(author_ids)
+        missing = author_ids - self.known.keys()
+        if missing and self.user.is_authenticated:
+            followed = set(
+                Follow.objects.filter(
+                    user=self.user, author_id__in=missing
+                ).values_list("author_id", flat=True)
+            )
+            self.known.update((pk, pk in followed) for pk in missing)
+        return {pk for pk in author_ids if self.known.get(pk)}
+
+    def is_following(self, author_id):
+        return author_id in self.following([author_id])
+
+
+def follow_state(request):
+    if not hasattr(request, "_follow_state"):
+        request._follow_state = FollowState(request.user)
+    return request._follow_state
+
+
+def render_follow_button(request, author_id, username, following):
+    if not request.user.is_authenticated or request.user.pk == author_id:
+        return ""
+    return render_to_string(
+        "posts/includes/follow_button.html",
+        {"username": username, "following": following},
+    )
+
+
+def fill_follow_buttons(html, request):
+    """Заменяет метки во фрагменте кнопками, спросив БД один раз."""
+    found = {
+        int(author_id): username
+        for author_id, username in FOLLOW_MARKER_RE.findall(html)
+    }
+    if not found:
+        return html
+    following = follow_state(request).following(found)
+    buttons = {
+        FOLLOW_MARKER % (author_id, username): render_follow_button(
+            request, author_id, username, author_id in following
+        )
+        for author_id, username in found.items()
+    }
+    return FOLLOW_MARKER_RE.sub(lambda match: buttons[match.group(0)], html)
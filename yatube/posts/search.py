@@ -0,0 +1,82 @@
+from django.db.models import Count, ExpressionWrapper, IntegerField, Sum
+
+from .models import Post, SearchToken
+from .pagination import CursorPaginator
+from .tokenize import tokenize
+
+# Сначала число совпавших термов запроса, затем их суммарная частота.
+MATCH_WEIGHT = 1000
+
+
+def index_post(post_id):
+    """Перестраивает термы одного поста в инвертированном индексе."""
+    SearchToken.objects.filter(post_id=post_id).delete()
+    post = Post.objects.filter(pk=post_id).values(
+        "text", "author_id", "group_id"
+    ).first()
+    if post is None:
+        return
+    SearchToken.objects.bulk_create(
+        SearchToken(
+            token=token,
+            post_id=post_id,
+            author_id=post["author_id"],
+            group_id=post["group_id"],
+            weight=weight,
+        )
+        for token, weight in tokenize(post["text"]).items()
+    )
+
+
+def index_posts(post_ids):
+    """Перестраивает индекс для пачки постов: три запроса на пачку."""
+    post_ids = list(post_ids)
+    SearchToken.objects.filter(post_id__in=post_ids).delete()
+    posts = Post.objects.filter(pk__in=post_ids).values_list(
+        "pk", "text", "author_id", "group_id"
+    )
+    SearchToken.objects.bulk_create(
+        SearchToken(
+            token=token,
+            post_id=post_id,
+            author_id=author_id,
+            group_id=group_id,
+            weight=weight,
+        )
+        for post_id, text, author_id, group_id in posts.iterator()
+        for token, weight in tokenize(text).items()
+    )
+    return len(post_ids)
+
+
+def search_posts(query, group=None, author=None):
+    """Совпадения по индексу: строки {"post_id": id, "rank": ранг}."""
+    tokens = list(tokenize(query))
+    rows = SearchToken.objects.filter(token__in=tokens)
+    if group is not None:
+        rows = rows.filter(group=group)
+    if author is not None:
+        rows = rows.filter(author=author)
+    rank = ExpressionWrapper(
+        Count("pk") * MATCH_WEIGHT + Sum("weight"),
+        output_field=IntegerField(),
+    )
+    return rows.values("post_id").annotate(rank=rank)
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсор по рангу совпадения; отдаёт посты с атрибутом rank."""
+
+    def __init__(self, rows, per_page):
+        super().__init__(rows, per_page, key_field="rank", pk_field="post_id")
+
+    def fetch(self, queryset):
+        rows = list(queryset)
+        posts = Post.objects.for_feed().in_bulk(row["post_id"] for row in rows)
+        page = []
+        for row in rows:
+            post = posts.get(row["post_id"])
+            if post is not None:
+                post.rank = row["rank"]
+                page.append(post)
+        return page
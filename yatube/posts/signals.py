@@ -0,0 +1,186 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.tasks import enqueue
+
+from . import conditional, search, thumbnails, timeline, trending
+from .counters import bump, bump_user
+from .feed_cache import bump_generation
+from .models import (
+    Comment, Follow, Group, GroupStats, Post, User, UserStats
+)
+
+
+def feed_changed(sender, **kwargs):
+    bump_generation()
+
+
+for model in (Post, Comment, Group, Follow):
+    post_save.connect(feed_changed, sender=model)
+    post_delete.connect(feed_changed, sender=model)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_pages_changed(sender, instance, **kwargs):
+    conditional.touch_post(
+        instance.pk,
+        instance.author_id,
+        instance.group_id,
+        getattr(instance, "_old_group_id", None),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_pages_changed(sender, instance, **kwargs):
+    conditional.touch_post_by_id(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_pages_changed(sender, instance, **kwargs):
+    conditional.touch(
+        "user:%s" % instance.user_id, "user:%s" % instance.author_id
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_pages_changed(sender, instance, **kwargs):
+    conditional.touch("group:%s" % instance.pk, conditional.NAMES)
+
+
+@receiver(post_save, sender=User)
+def user_pages_changed(sender, instance, update_fields=None, **kwargs):
+    # Вход обновляет только last_login, на страницах это не видно.
+    if update_fields and set(update_fields) == {"last_login"}:
+        return
+    conditional.touch("user:%s" % instance.pk, conditional.NAMES)
+    # Имена авторов есть во фрагментах лент и в ответах API.
+    bump_generation()
+
+
+@receiver(post_save, sender=User)
+def user_stats_create(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Group)
+def group_stats_create(sender, instance, created, **kwargs):
+    # Новая группа видна в каталоге сразу, цифры — после пересчёта.
+    if created:
+        GroupStats.objects.get_or_create(group=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_old_values(sender, instance, **kwargs):
+    instance._old_group_id = instance._old_image = None
+    if instance.pk is not None:
+        old = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list("group_id", "image")
+            .first()
+        )
+        if old is not None:
+            instance._old_group_id, instance._old_image = old
+
+
+@receiver(pre_save, sender=Post)
+def post_initial_trend_score(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance.trend_score = trending.event_score(
+            "post", instance.pub_date or timezone.now()
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_counters(sender, instance, created, **kwargs):
+    if created:
+        bump_user(instance.author_id, "posts_count", 1)
+        if instance.group_id:
+            bump(Group, instance.group_id, "posts_count", 1)
+        return
+    old_group_id = getattr(instance, "_old_group_id", None)
+    if old_group_id != instance.group_id:
+        if old_group_id:
+            bump(Group, old_group_id, "posts_count", -1)
+        if instance.group_id:
+            bump(Group, instance.group_id, "posts_count", 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_delete_counters(sender, instance, **kwargs):
+    bump(UserStats, instance.author_id, "posts_count", -1)
+    if instance.group_id:
+        bump(Group, instance.group_id, "posts_count", -1)
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        enqueue(timeline.fan_out_post, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_search_index(sender, instance, **kwargs):
+    enqueue(search.index_post, instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_thumbnails(sender, instance, **kwargs):
+    old_image = getattr(instance, "_old_image", None)
+    if instance.image and instance.image.name != old_image:
+        thumbnails.schedule_thumbnails(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_counters(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        bump(Post, instance.post_id, "comments_count", 1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_trending(sender, instance, created, **kwargs):
+    if created and instance.post_id:
+        trending.record(instance.post_id, "comment", instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_delete_counters(sender, instance, **kwargs):
+    if instance.post_id:
+        bump(Post, instance.post_id, "comments_count", -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_counters(sender, instance, created, **kwargs):
+    if created:
+        bump_user(instance.author_id, "followers_count", 1)
+        bump_user(instance.user_id, "following_count", 1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.record_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_delete_counters(sender, instance, **kwargs):
+    bump(UserStats, instance.author_id, "followers_count", -1)
+    bump(UserStats, instance.user_id, "following_count", -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    if created:
+        enqueue(
+            timeline.backfill_timeline, instance.user_id, instance.author_id
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def unfollow_cleanup(sender, instance, **kwargs):
+    enqueue(timeline.drop_author, instance.user_id, instance.author_id)
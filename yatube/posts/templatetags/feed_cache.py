@@ -0,0 +1,40 @@
+from django import template
+
+from ..feed_cache import get_fragment, set_fragment
+from ..relationships import fill_follow_buttons
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, name, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        value = get_fragment(self.name, vary_on)
+        if value is None:
+            with context.push(in_feedcache=True):
+                value = self.nodelist.render(context)
+            set_fragment(self.name, vary_on, value)
+        return fill_follow_buttons(value, context["request"])
+
+
+@register.tag
+def feedcache(parser, token):
+    """Кеширует фрагмент ленты до следующей правки постов.
+
+    {% feedcache index request.GET.urlencode %} ... {% endfeedcache %}
+    """
+    nodelist = parser.parse(("endfeedcache",))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            "%r tag requires a fragment name." % tokens[0]
+        )
+    return FeedCacheNode(
+        nodelist, tokens[1], [parser.compile_filter(t) for t in tokens[2:]]
+    )
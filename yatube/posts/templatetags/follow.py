@@ -0,0 +1,26 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..relationships import (
+    FOLLOW_MARKER, follow_state, render_follow_button
+)
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def follow_button(context, author):
+    """Кнопка подписки на автора для пользователя запроса.
+
+    Внутри {% feedcache %} выводит метку: фрагмент общий для всех, и
+    кнопку подставляет FeedCacheNode.
+    """
+    if context.get("in_feedcache"):
+        return mark_safe(FOLLOW_MARKER % (author.pk, author.username))
+    request = context["request"]
+    return render_follow_button(
+        request,
+        author.pk,
+        author.username,
+        follow_state(request).is_following(author.pk),
+    )
@@ -0,0 +1,11 @@
+from django import template
+
+from ..thumbnails import ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(post, name):
+    """Миниатюра картинки поста, если она уже построена, иначе None."""
+    return ready_thumbnail(post.image, name, post_id=post.pk)
@@ -0,0 +1,116 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        for number in range(15):
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_pages_follow_cursor(self):
+        """Ленты листаются курсором до конца без повторов."""
+        urls = (
+            reverse('api:post_list'),
+            reverse('api:group_posts', args=[self.group.slug]),
+            reverse('api:user_posts', args=[self.user.username]),
+        )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                seen = []
+                while url:
+                    data = self.client.get(url).json()
+                    seen.extend(row['id'] for row in data['results'])
+                    url = data['next']
+                self.assertEqual(seen, expected)
+
+    def test_post_fields(self):
+        """Пост отдаётся с автором и группой по естественным ключам."""
+        post = Post.objects.first()
+        response = self.client.get(
+            reverse('api:post_detail', args=[post.pk])
+        )
+        data = response.json()
+        self.assertEqual(data['author'], 'author')
+        self.assertEqual(data['group'], 'group')
+        self.assertEqual(data['text'], post.text)
+        self.assertIsNone(data['image'])
+
+    def test_limit_is_capped(self):
+        """Параметр limit ограничен сверху."""
+        response = self.client.get(reverse('api:post_list') + '?limit=1000')
+        self.assertEqual(len(response.json()['results']), 15)
+        response = self.client.get(reverse('api:post_list') + '?limit=3')
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_not_modified_without_queries(self):
+        """Повтор с If-None-Match получает 304 без запросов к БД."""
+        url = reverse('api:post_list')
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            repeat = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(repeat.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_etag_changes_with_feed(self):
+        """Новый пост меняет ETag ленты."""
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(author=self.user, text='Свежий пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['text'], 'Свежий пост')
+
+    def test_etag_changes_with_username(self):
+        """Новое имя автора меняет ETag, вход в систему — нет."""
+        url = reverse('api:post_list')
+        etag = self.client.get(url)['ETag']
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        user.username = 'renamed'
+        user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['author'], 'renamed')
+
+    def test_missing_objects_return_json_404(self):
+        """Несуществующие группа, автор и пост дают JSON 404."""
+        urls = (
+            reverse('api:group_posts', args=['missing']),
+            reverse('api:user_posts', args=['missing']),
+            reverse('api:post_detail', args=[10 ** 6]),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIn('detail', response.json())
@@ -1,7 +1,24 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-from ..models import Group, Post
+from ..management.commands import import_posts
+from ..models import (
+    Comment, Follow, Group, Post, SearchToken, TimelineEntry, UserStats
+)
 
 User = get_user_model()
 
@@ -92,3 +109,251 @@ class GroupModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     group._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+
+    def counters(self):
+        stats = UserStats.objects.get(user=self.user)
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        return (
+            stats.posts_count,
+            stats.followers_count,
+            self.group.posts_count,
+            self.other_group.posts_count,
+        )
+
+    def test_post_counters_follow_create_edit_delete(self):
+        """Счётчики постов следуют за созданием, сменой группы и удалением."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', group=self.group
+        )
+        self.assertEqual(self.counters(), (1, 0, 1, 0))
+        post.group = self.other_group
+        post.save()
+        self.assertEqual(self.counters(), (1, 0, 0, 1))
+        post.delete()
+        self.assertEqual(self.counters(), (0, 0, 0, 0))
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки обновляют свои счётчики."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.counters()[1], 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        Follow.objects.filter(user=self.reader).delete()
+        Comment.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.counters()[1], 0)
+
+    def test_rebuild_counters_repairs_drift(self):
+        """Команда rebuild_counters пересчитывает счётчики с нуля."""
+        Post.objects.create(author=self.user, text='Текст', group=self.group)
+        UserStats.objects.all().delete()
+        Group.objects.update(posts_count=7)
+        call_command('rebuild_counters', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.counters(), (1, 0, 1, 0))
+
+    def test_rebuild_counters_keeps_trending(self):
+        """rebuild_counters не стирает вклад подписок в популярность."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.user)
+        scores = list(Post.objects.values_list('pk', 'trend_score'))
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(
+            list(Post.objects.values_list('pk', 'trend_score')), scores
+        )
+        call_command('rebuild_trending', chunk_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertLess(post.trend_score, dict(scores)[post.pk])
+
+
+class SeedCommandTest(TestCase):
+    def test_seed_creates_consistent_dataset(self):
+        """Команда seed создаёт связанные данные с корректными счётчиками."""
+        call_command(
+            'seed', users=20, groups=3, posts=200, comments=50, follows=40,
+            batch_size=30, search_index=True, stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 20)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertEqual(Follow.objects.count(), 40)
+        dates = Post.objects.order_by('pk').values_list('pub_date', flat=True)
+        self.assertEqual(list(dates), sorted(dates))
+        self.assertGreater(dates.last() - dates.first(), timedelta(days=300))
+        for user in User.objects.select_related('stats'):
+            self.assertEqual(user.stats.posts_count, user.posts.count())
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(SearchToken.objects.exists())
+
+    def test_seed_refuses_existing_prefix(self):
+        """Повторный запуск с тем же префиксом останавливается."""
+        User.objects.create_user(username='seed0')
+        with self.assertRaises(CommandError):
+            call_command('seed', users=1, stdout=StringIO())
+
+
+class ExportImportTest(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.posts = [
+            Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {number}'
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.dump = os.path.join(directory, 'dump.jsonl')
+        call_command('export_posts', self.dump, stdout=StringIO())
+
+    def snapshot(self):
+        # id при загрузке назначает база, сравниваем по содержимому.
+        return (
+            list(Post.objects.order_by('pub_date').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date'
+            )),
+            list(Comment.objects.values_list(
+                'post__text', 'author__username', 'text'
+            )),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def test_round_trip(self):
+        """Выгрузка и загрузка восстанавливают посты и связи по username."""
+        expected = self.snapshot()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        call_command('import_posts', self.dump, stdout=StringIO())
+        self.assertEqual(self.snapshot(), expected)
+        self.assertEqual(
+            User.objects.get(username='author').stats.posts_count, 5
+        )
+        self.assertEqual(TimelineEntry.objects.count(), 5)
+        # Счёт новых постов — сам пост и комментарии, как при пересчёте.
+        scores = list(Post.objects.order_by('pk').values_list(
+            'trend_score', flat=True
+        ))
+        call_command('rebuild_trending', stdout=StringIO())
+        for score, rebuilt in zip(scores, Post.objects.order_by(
+            'pk'
+        ).values_list('trend_score', flat=True)):
+            self.assertAlmostEqual(score, rebuilt)
+
+    def test_resume_does_not_duplicate(self):
+        """Продолжение после обрыва не дублирует уже загруженные строки."""
+        expected = self.snapshot()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        with mock.patch.object(
+            import_posts.Command, 'load_follow', side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                call_command('import_posts', self.dump, stdout=StringIO())
+        self.assertTrue(os.path.exists(self.dump + '.checkpoint'))
+        call_command('import_posts', self.dump, stdout=StringIO())
+        self.assertEqual(self.snapshot(), expected)
+        self.assertFalse(os.path.exists(self.dump + '.checkpoint'))
+        # Даже с начала файла уже загруженное не повторяется.
+        call_command(
+            'import_posts', self.dump, restart=True, stdout=StringIO()
+        )
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_taken_ids_do_not_merge_rows(self):
+        """Чужой пост с занятым id не теряется и не отдаёт комментарии."""
+        local = self.posts[0]
+        created = timezone.now().isoformat()
+        records = [
+            {
+                'model': 'post', 'id': local.pk, 'author': 'remote',
+                'group': None, 'text': 'REMOTE POST', 'pub_date': created,
+                'image': '',
+            },
+            {
+                'model': 'comment', 'id': 1, 'post': local.pk,
+                'author': None, 'text': 'remote comment', 'created': created,
+            },
+            {
+                'model': 'comment', 'id': 2, 'post': 10 ** 6,
+                'author': 'remote', 'text': 'orphan', 'created': created,
+            },
+        ]
+        with open(self.dump, 'w') as dump:
+            for record in records:
+                dump.write(json.dumps(record) + '\n')
+        output = StringIO()
+        call_command('import_posts', self.dump, stdout=output)
+        remote = Post.objects.get(text='REMOTE POST')
+        self.assertNotEqual(remote.pk, local.pk)
+        self.assertEqual(remote.author.username, 'remote')
+        comment = Comment.objects.get(text='remote comment')
+        self.assertEqual(comment.post, remote)
+        self.assertIsNone(comment.author)
+        self.assertFalse(local.comments.filter(text='remote comment').exists())
+        self.assertFalse(Comment.objects.filter(text='orphan').exists())
+        self.assertIn(
+            'comment: пропущено 1 (пост не загружен)', output.getvalue()
+        )
+
+    def test_batch_is_inserted_at_once(self):
+        """Посты порции вставляются одним INSERT, связи не путаются."""
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_posts', self.dump, stdout=StringIO())
+        inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT INTO "posts_post"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post.text, 'Пост 0')
+
+    def test_import_of_older_rows_changes_etags(self):
+        """Загрузка старых постов меняет ETag профиля и группы."""
+        cache.clear()
+        Post.objects.filter(pk__in=[
+            post.pk for post in self.posts[:-1]
+        ]).delete()
+        urls = (
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+        )
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        call_command('import_posts', self.dump, stdout=StringIO())
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
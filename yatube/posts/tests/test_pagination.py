@@ -0,0 +1,95 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..pagination import CursorPaginator, decode_cursor
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {number}')
+            for number in range(25)
+        )
+
+    def test_cursor_walks_all_posts_in_order(self):
+        """Курсор проходит ленту целиком без пропусков и повторов."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        page = paginator.get_page()
+        seen = list(page)
+        while page.has_next():
+            page = paginator.get_page(after=page.next_cursor)
+            seen.extend(page)
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(page), 5)
+
+    def test_before_returns_previous_page(self):
+        """Токен before возвращает предыдущую страницу."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_page()
+        second = paginator.get_page(after=first.next_cursor)
+        back = paginator.get_page(before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Битый токен не роняет страницу, а открывает начало ленты."""
+        self.assertIsNone(decode_cursor('не-курсор'))
+        response = self.client.get(reverse('posts:index') + '?after=xyz')
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        """Токен с ключом чужого типа открывает начало ленты, а не 500."""
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        pages = {
+            reverse('posts:index'): (
+                [5, 1], [[1], 1], ['2020-13-45T00:00:00', 1],
+                ['2020-01-01T00:00:00', True], [None, 1],
+            ),
+            reverse('api:post_list'): ([5, 1], [{}, 1]),
+            reverse('posts:group_index'): (
+                ['2020-01-01T00:00:00', 1], [2 ** 70, 1], [1.5, 1],
+            ),
+            reverse('posts:popular'): (
+                ['2020-01-01T00:00:00', 1], [True, 1], [1.0, 2 ** 70],
+            ),
+            reverse('posts:group_list', args=[group.slug]): ([5, 1],),
+        }
+        for url, keys in pages.items():
+            for key in keys:
+                token = base64.urlsafe_b64encode(
+                    json.dumps(key).encode()
+                ).decode()
+                for direction in ('after', 'before'):
+                    with self.subTest(url=url, key=key, direction=direction):
+                        response = self.client.get(url, {direction: token})
+                        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(decode_cursor(
+            base64.urlsafe_b64encode(b'[Infinity, 1]').decode(), float
+        ))
+
+    def test_deep_page_has_no_offset_and_count(self):
+        """Глубокая страница — один запрос без OFFSET и COUNT."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        last = Post.objects.order_by('pub_date', 'pk').first()
+        with CaptureQueriesContext(connection) as queries:
+            list(paginator.get_page(after=paginator.cursor_for(last)))
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql'].upper()
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
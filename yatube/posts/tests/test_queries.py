@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Бюджет запросов на страницу при полной странице постов. Сессия
+# авторизованного клиента читается из кеша, пользователь на первом
+# запросе — из БД; в числа входят выборка валидаторов условного GET
+# у группы, профиля и поста и один запрос подписок для кнопок в ленте.
+QUERY_BUDGETS = {
+    'index': 1,
+    'group_list': 3,
+    'profile': 4,
+    'post_detail': 4,
+    'follow_index': 3,
+    'group_index': 1,
+    'popular': 1,
+}
+
+
+# Просмотры не сбрасываются в БД посреди подсчёта запросов.
+@override_settings(TRENDING_VIEW_FLUSH=60 * 60)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.author = User.objects.create_user(username='author')
+        for number in range(12):
+            author = User.objects.create_user(
+                username=f'user{number}', first_name='Имя'
+            )
+            group = Group.objects.create(
+                title=f'Группа {number}',
+                slug=f'slug-{number}',
+                description='Тестовое описание',
+            )
+            Post.objects.create(author=author, text='Текст', group=group)
+            Post.objects.create(
+                author=cls.author, text='Текст', group=cls.group
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.post = Post.objects.filter(author=cls.author).first()
+        for commenter in User.objects.exclude(pk=cls.author.pk):
+            Comment.objects.create(
+                post=cls.post, author=commenter, text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def pages(self):
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse(
+                'posts:group_list', kwargs={'slug': 'test-slug'}
+            ),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': 'author'}
+            ),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}
+            ),
+            'follow_index': reverse('posts:follow_index'),
+            'group_index': reverse('posts:group_index'),
+            'popular': reverse('posts:popular'),
+        }
+
+    def capture(self, name, address):
+        client = (
+            self.authorized_client if name == 'follow_index' else self.client
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(address)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_feeds_stay_within_query_budget(self):
+        """Число запросов страницы не зависит от числа постов на ней."""
+        for name, address in self.pages().items():
+            with self.subTest(view=name):
+                queries = self.capture(name, address)
+                self.assertLessEqual(
+                    len(queries), QUERY_BUDGETS[name], '\n'.join(queries)
+                )
+
+    def test_session_and_user_come_from_cache(self):
+        """Повторный запрос не читает сессию и пользователя из БД."""
+        address = self.pages()['post_detail']
+        self.client.get(address)
+        self.authorized_client.get(address)
+        with CaptureQueriesContext(connection) as anonymous:
+            self.client.get(address)
+        with CaptureQueriesContext(connection) as authorized:
+            self.authorized_client.get(address)
+        self.assertEqual(len(authorized), len(anonymous))
+        for query in authorized:
+            self.assertNotIn('django_session', query['sql'])
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по индексам: без полного скана и сортировки."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN есть только в SQLite')
+        for name, address in self.pages().items():
+            for sql in self.capture(name, address):
+                with self.subTest(view=name, sql=sql):
+                    self.assertIndexedPlan(sql)
+
+    def assertIndexedPlan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            plan = [row[-1] for row in cursor.fetchall()]
+        for step in plan:
+            full_scan = step.startswith('SCAN') and 'USING' not in step
+            self.assertFalse(full_scan, '\n'.join(plan))
+            self.assertNotIn('TEMP B-TREE', step, '\n'.join(plan))
@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, SearchToken
+from ..tokenize import tokenize
+
+User = get_user_model()
+
+
+class TokenizeTest(TestCase):
+    def test_russian_word_forms_share_a_term(self):
+        """Разные формы русского слова дают один терм."""
+        self.assertEqual(
+            set(tokenize('котик котики котиков Котикам')), {'котик'}
+        )
+
+    def test_stop_words_and_yo_are_normalized(self):
+        """Служебные слова выброшены, ё приравнена к е."""
+        self.assertEqual(tokenize('и ёлка на елке'), {'елк': 2})
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.best = Post.objects.create(
+            author=cls.user, text='Рыжие котики и рыжий кот', group=cls.group
+        )
+        cls.weaker = Post.objects.create(author=cls.other, text='Котики спят')
+        Post.objects.create(author=cls.user, text='Про собак')
+
+    def search(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        return list(response.context['page_obj'])
+
+    def test_results_are_ranked(self):
+        """Пост с большим числом совпавших термов идёт первым."""
+        self.assertEqual(
+            self.search(q='рыжих котиков'), [self.best, self.weaker]
+        )
+
+    def test_group_and_author_filters(self):
+        """Фильтры по группе и автору сужают выдачу."""
+        self.assertEqual(self.search(q='котики', group='test-slug'),
+                         [self.best])
+        self.assertEqual(self.search(q='котики', author='other'),
+                         [self.weaker])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        weaker = Post.objects.get(pk=self.weaker.pk)
+        weaker.text = 'Собаки спят'
+        weaker.save()
+        self.assertEqual(self.search(q='котики'), [self.best])
+        Post.objects.filter(pk=self.best.pk).delete()
+        self.assertFalse(SearchToken.objects.filter(token='котик').exists())
+
+    def test_results_use_cursor_pagination(self):
+        """Выдача листается курсором и не теряет параметры поиска."""
+        for number in range(12):
+            Post.objects.create(author=self.user, text=f'Котики {number}')
+        response = self.client.get(reverse('posts:search'), {'q': 'котики'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(
+            response, response.context['page_query'] + '&amp;after='
+        )
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'котики', 'after': page_obj.next_cursor},
+        )
+        self.assertEqual(len(response.context['page_obj']), 4)
@@ -0,0 +1,171 @@
+import functools
+import math
+import threading
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(TRENDING_HALF_LIFE=12 * 3600)
+class ScoreTest(TestCase):
+    def logsum(self, events):
+        return functools.reduce(trending.logaddexp, (
+            trending.event_score(kind, when) for kind, when in events
+        ))
+
+    def decayed(self, events, now):
+        """Затухший счёт «в лоб», без логарифмов."""
+        return sum(
+            settings.TRENDING_WEIGHTS[kind]
+            * 0.5 ** ((now - when).total_seconds() / (12 * 3600))
+            for kind, when in events
+        )
+
+    def test_log_score_tracks_decayed_score(self):
+        """Разность trend_score — логарифм отношения затухших счетов."""
+        now = timezone.now()
+        old = [('comment', now - timedelta(days=2))] * 10
+        fresh = [('post', now - timedelta(hours=1))] * 2
+        self.assertAlmostEqual(
+            math.exp(self.logsum(old) - self.logsum(fresh)),
+            self.decayed(old, now) / self.decayed(fresh, now),
+        )
+        self.assertLess(self.logsum(old), self.logsum(fresh))
+
+
+class TrendingEventsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.older = Post.objects.create(author=cls.author, text='Старый')
+        cls.newer = Post.objects.create(author=cls.reader, text='Новый')
+
+    def setUp(self):
+        # Просмотры прошлых тестов не должны попасть в счёт этого.
+        trending._views.clear()
+
+    def score(self, post):
+        return Post.objects.values_list(
+            'trend_score', flat=True
+        ).get(pk=post.pk)
+
+    def popular(self):
+        response = self.client.get(reverse('posts:popular'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_outranks_older_one(self):
+        """Без событий популярное идёт от новых постов к старым."""
+        self.assertEqual(self.popular(), [self.newer, self.older])
+
+    def test_comments_raise_post(self):
+        """Комментарии поднимают пост выше более свежего."""
+        Comment.objects.create(post=self.older, author=self.reader, text='Ок')
+        self.assertEqual(self.popular(), [self.older, self.newer])
+
+    def test_follow_credits_latest_post(self):
+        """Подписка засчитывается последнему посту автора."""
+        older, newer = self.score(self.older), self.score(self.newer)
+        Follow.objects.create(user=self.author, author=self.reader)
+        self.assertEqual(self.score(self.older), older)
+        self.assertGreater(self.score(self.newer), newer)
+
+    def test_follow_churn_counts_once(self):
+        """Повторные подписки после отписки счёт не поднимают."""
+        Follow.objects.create(user=self.author, author=self.reader)
+        once = self.score(self.newer)
+        for _ in range(5):
+            Follow.objects.filter(user=self.author).delete()
+            Follow.objects.create(user=self.author, author=self.reader)
+        self.assertEqual(self.score(self.newer), once)
+
+    def test_batch_equals_single_events(self):
+        """Пачка событий даёт тот же счёт, что события по одному."""
+        now = timezone.now()
+        events = [
+            (self.older.pk, 'comment', now, 1),
+            (self.older.pk, 'view', now - timedelta(hours=3), 4),
+            (self.newer.pk, 'follow', now, 1),
+        ]
+        for event in events:
+            trending.add_events([event])
+        single = self.score(self.older), self.score(self.newer)
+        trending.rebuild_trending_scores(self.older.pk, self.newer.pk)
+        trending.add_events(events)
+        for score, post in zip(single, (self.older, self.newer)):
+            self.assertAlmostEqual(score, self.score(post))
+
+    def test_rebuild_matches_incremental(self):
+        """Пересчёт с нуля сходится с накопленным счётом."""
+        Comment.objects.create(post=self.older, author=self.reader, text='1')
+        Comment.objects.create(post=self.older, author=self.author, text='2')
+        incremental = self.score(self.older)
+        Post.objects.update(trend_score=0)
+        trending.rebuild_trending_scores(self.older.pk, self.older.pk)
+        self.assertAlmostEqual(self.score(self.older), incremental)
+
+    @override_settings(TRENDING_VIEW_FLUSH=0)
+    def test_views_are_flushed(self):
+        """Просмотры страницы поста доходят до счёта."""
+        before = self.score(self.older)
+        self.client.get(reverse('posts:post_detail', args=[self.older.pk]))
+        self.assertGreater(self.score(self.older), before)
+
+    @override_settings(TRENDING_VIEW_FLUSH=60 * 60)
+    def test_revalidated_view_is_counted(self):
+        """Ответ 304 тоже засчитывается как просмотр."""
+        url = reverse('posts:post_detail', args=[self.older.pk])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(trending._views[self.older.pk], 2)
+
+    @override_settings(TASKS_ALWAYS_EAGER=False, TRENDING_VIEW_FLUSH=0.01)
+    def test_quiet_batch_is_flushed_by_timer(self):
+        """Пачку сбрасывает таймер, даже если новых просмотров нет."""
+        flushed = threading.Event()
+        with mock.patch.object(
+            trending, 'enqueue', side_effect=lambda func: flushed.set()
+        ) as enqueue:
+            trending.record_view(self.older.pk)
+            self.assertTrue(flushed.wait(5))
+        enqueue.assert_called_once_with(trending.flush_views)
+
+    @override_settings(TASKS_ALWAYS_EAGER=False, TRENDING_VIEW_FLUSH=60 * 60)
+    def test_batch_is_flushed_at_exit(self):
+        """Остаток пачки пишется в БД при выходе процесса."""
+        before = self.score(self.older)
+        trending.record_view(self.older.pk)
+        trending._flush_at_exit()
+        self.assertGreater(self.score(self.older), before)
+        self.assertIsNone(trending._flush_timer)
+        self.assertFalse(trending._views)
+
+    def test_popular_pages_by_cursor(self):
+        """Популярное листается курсором по счёту."""
+        for number in range(12):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        response = self.client.get(reverse('posts:popular'))
+        page = response.context['page_obj']
+        seen = [post.pk for post in page]
+        response = self.client.get(
+            reverse('posts:popular'), {'after': page.next_cursor}
+        )
+        seen.extend(post.pk for post in response.context['page_obj'])
+        self.assertEqual(
+            seen,
+            list(Post.objects.order_by('-trend_score', '-pk').values_list(
+                'pk', flat=True
+            )),
+        )
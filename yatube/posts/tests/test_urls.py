@@ -56,6 +56,7 @@ class PostURLTest(TestCase):
         """URL-адрес использует соответствующий шаблон."""
         templates_url_names = {
             '/': 'posts/index.html',
+            '/group/': 'posts/group_index.html',
             '/group/test-slug/': 'posts/group_list.html',
             '/profile/test_user/': 'posts/profile.html',
             '/posts/1/': 'posts/post_detail.html',
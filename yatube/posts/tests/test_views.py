@@ -1,14 +1,30 @@
 import shutil
 import tempfile
+import time
+from datetime import timedelta
 
 from django.conf import settings
+from django.core.cache import cache, caches
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import http_date
 from django import forms
 
-from ..models import Group, Post
+from core.cache import LOG_VERSION_KEY
+
+from .. import conditional, timeline
+from ..counters import refresh_group_stats
+from ..feed_cache import (
+    GENERATION_KEY, bump_generation, fragment_stats, get_generation
+)
+from ..thumbnails import ready_thumbnail
+from ..models import (
+    Comment, Follow, Group, GroupStats, Post, TimelineEntry
+)
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -312,3 +328,479 @@ class CasheIndexTest(TestCase):
         context_data_len = response.context['page_obj'].count
         post_context_cache_len = Post.objects.count()
         self.assertNotEqual(context_data_len, post_context_cache_len)
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост'
+        )
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='HasNoName')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow_feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_timeline(self):
+        """После подписки в ленте появляются прежние посты автора."""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(self.follow_feed(), [self.old_post])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленту подписчика."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.follow_feed(), [new_post, self.old_post])
+
+    def test_unfollow_cleans_timeline(self):
+        """После отписки посты автора пропадают из ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'author'})
+        )
+        self.assertEqual(self.follow_feed(), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_DEPTH=3)
+    def test_timeline_is_trimmed_to_depth(self):
+        """Лента подписок не растёт больше TIMELINE_DEPTH."""
+        Follow.objects.create(user=self.user, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(5)
+        ]
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 3
+        )
+        self.assertEqual(self.follow_feed(), posts[:1:-1])
+
+    @override_settings(TIMELINE_DEPTH=2)
+    def test_fan_out_trims_in_one_query(self):
+        """Обрезка лент при раскладке — один запрос на порцию подписчиков."""
+        counts = []
+        for total in (2, 6):
+            author = User.objects.create_user(username=f'author{total}')
+            followers = [
+                User.objects.create_user(username=f'follower{total}_{n}')
+                for n in range(total)
+            ]
+            for follower in followers:
+                Follow.objects.create(user=follower, author=author)
+            Post.objects.create(author=author, text='Первый')
+            Post.objects.create(author=author, text='Второй')
+            post = Post.objects.create(author=author, text='Третий')
+            with CaptureQueriesContext(connection) as queries:
+                timeline.fan_out_post(post.pk)
+            counts.append(len(queries))
+            for follower in followers:
+                self.assertEqual(
+                    list(TimelineEntry.objects.filter(
+                        user=follower
+                    ).values_list('post__text', flat=True)),
+                    ['Третий', 'Второй'],
+                )
+        self.assertEqual(counts[0], counts[1])
+
+
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+        for number in range(13):
+            Post.objects.create(author=cls.user, text=f'Пост {number}')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_are_cached_separately(self):
+        """Каждая страница ленты кешируется под своим ключом."""
+        first = self.client.get(reverse('posts:index'))
+        second = self.client.get(reverse('posts:index') + '?page=2')
+        self.assertContains(first, 'Пост 12')
+        self.assertNotContains(second, 'Пост 12')
+        self.assertContains(second, 'Пост 0')
+
+    def test_new_post_invalidates_cache(self):
+        """Новый пост виден сразу, а не после истечения кеша."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(author=self.user, text='Свежий пост')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Свежий пост')
+
+    def test_hits_and_misses_are_counted(self):
+        """Попадания и промахи кеша считаются по фрагментам."""
+        before = fragment_stats()['index']
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        after = fragment_stats()['index']
+        self.assertEqual(
+            {kind: after[kind] - before[kind] for kind in after},
+            {'hits': 1, 'misses': 1},
+        )
+
+    def test_counting_does_not_write_shared_cache(self):
+        """Счёт попаданий не пишет в общий кеш и не двигает журнал L1."""
+        self.client.get(reverse('posts:index'))
+        version = caches['invalidations'].get(LOG_VERSION_KEY)
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            caches['invalidations'].get(LOG_VERSION_KEY), version
+        )
+
+    def test_lost_generation_never_repeats(self):
+        """Поколение, вытесненное из кеша, не начинается заново."""
+        seen = [get_generation()]
+        for _ in range(3):
+            seen.append(bump_generation())
+            cache.delete(GENERATION_KEY)
+            seen.append(get_generation())
+            cache.delete(GENERATION_KEY)
+        self.assertEqual(seen, sorted(set(seen)))
+
+    def test_lost_generation_drops_fragments(self):
+        """После потери поколения лента не отдаёт старый фрагмент."""
+        self.client.get(reverse('posts:index'))
+        cache.delete(GENERATION_KEY)
+        Post.objects.filter(text='Пост 12').update(text='Без сигналов')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Без сигналов')
+
+
+class FollowButtonsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.followed = User.objects.create_user(username='followed')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.followed)
+        for author in (cls.reader, cls.followed, cls.other):
+            for number in range(3):
+                Post.objects.create(author=author, text=f'Пост {number}')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_buttons_follow_reader(self):
+        """Кнопки в общем фрагменте ленты — по подпискам читателя."""
+        self.client.get(reverse('posts:index'))
+        hits = fragment_stats()['index']['hits']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.reader_client.get(reverse('posts:index'))
+        self.assertEqual(fragment_stats()['index']['hits'], hits + 1)
+        self.assertContains(response, reverse(
+            'posts:profile_unfollow', args=[self.followed.username]
+        ))
+        self.assertContains(response, reverse(
+            'posts:profile_follow', args=[self.other.username]
+        ))
+        self.assertNotContains(response, reverse(
+            'posts:profile_follow', args=[self.reader.username]
+        ))
+        follow_queries = [
+            query for query in queries if 'posts_follow' in query['sql']
+        ]
+        self.assertEqual(len(follow_queries), 1)
+
+    def test_anonymous_gets_no_buttons(self):
+        """Гость не видит кнопок, даже если фрагмент собрал читатель."""
+        self.reader_client.get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'follow-button')
+        self.assertNotContains(response, reverse(
+            'posts:profile_follow', args=[self.other.username]
+        ))
+
+
+@override_settings(GROUP_ACTIVE_DAYS=30)
+class GroupDirectoryTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.quiet = Group.objects.create(
+            title='Тихая', slug='quiet', description='Описание'
+        )
+        cls.busy = Group.objects.create(
+            title='Шумная', slug='busy', description='Описание'
+        )
+        old = Post.objects.create(
+            author=cls.other, group=cls.busy, text='Старый'
+        )
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=old.pub_date - timedelta(days=60)
+        )
+        for number in range(3):
+            Post.objects.create(
+                author=cls.author, group=cls.busy, text=f'Пост {number}'
+            )
+        cls.latest = Post.objects.create(
+            author=cls.author, group=cls.quiet, text='Один'
+        )
+        refresh_group_stats(1, Group.objects.latest('pk').pk)
+
+    def test_directory_shows_rollup(self):
+        """Каталог берёт цифры из сводки, самые большие группы первыми."""
+        response = self.client.get(reverse('posts:group_index'))
+        busy, quiet = response.context['page_obj']
+        self.assertEqual(busy.group, self.busy)
+        self.assertEqual(busy.posts_count, 4)
+        # Автор старого поста за окно активности не попадает.
+        self.assertEqual(busy.authors_count, 1)
+        self.assertEqual(quiet.group, self.quiet)
+        self.assertEqual(quiet.last_post, self.latest.pub_date)
+
+    def test_directory_waits_for_refresh(self):
+        """Новые посты видны в каталоге после пересчёта сводки."""
+        Post.objects.create(author=self.other, group=self.quiet, text='Ещё')
+        stats = GroupStats.objects.get(group=self.quiet)
+        self.assertEqual(stats.posts_count, 1)
+        refresh_group_stats(self.quiet.pk, self.quiet.pk)
+        stats.refresh_from_db()
+        self.assertEqual(stats.posts_count, 2)
+        self.assertEqual(stats.authors_count, 2)
+
+    def test_new_group_listed(self):
+        """Новая группа попадает в каталог сразу, с нулями."""
+        group = Group.objects.create(
+            title='Новая', slug='new', description='Описание'
+        )
+        response = self.client.get(reverse('posts:group_index'))
+        self.assertContains(
+            response, reverse('posts:group_list', args=[group.slug])
+        )
+
+    def test_directory_pages_by_cursor(self):
+        """Каталог листается курсором до конца без повторов."""
+        Group.objects.bulk_create(
+            Group(title=f'Группа {number}', slug=f'group-{number}')
+            for number in range(settings.GROUP_PAGE_COUNT)
+        )
+        refresh_group_stats(1, Group.objects.latest('pk').pk)
+        page = self.client.get(
+            reverse('posts:group_index')
+        ).context['page_obj']
+        seen = [stats.group_id for stats in page]
+        while page.has_next():
+            page = self.client.get(
+                reverse('posts:group_index'), {'after': page.next_cursor}
+            ).context['page_obj']
+            seen.extend(stats.group_id for stats in page)
+        self.assertEqual(seen[:2], [self.busy.pk, self.quiet.pk])
+        self.assertEqual(
+            sorted(seen), list(Group.objects.order_by('pk').values_list(
+                'pk', flat=True
+            ))
+        )
+
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('thumb.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_thumbnail_is_built_on_upload(self):
+        """Миниатюра строится при сохранении поста, а не при показе."""
+        post = self.create_post()
+        self.assertIsNotNone(ready_thumbnail(post.image, 'card'))
+
+    @override_settings(TASKS_ALWAYS_EAGER=False)
+    def test_page_falls_back_to_original_while_queued(self):
+        """Пока миниатюры нет, лента показывает оригинал картинки."""
+        post = self.create_post()
+        response = self.client.get(reverse('posts:index'))
+        self.assertIsNone(ready_thumbnail(post.image, 'card'))
+        self.assertContains(response, post.image.url)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def pages(self):
+        return (
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+        )
+
+    def etags(self, client=None):
+        client = client or self.client
+        return {url: client.get(url)['ETag'] for url in self.pages()}
+
+    def assertStatuses(self, etags, expected, client=None):
+        client = client or self.client
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, expected[url])
+
+    def test_unchanged_page_not_modified(self):
+        """Неизменная страница отдаёт 304 одним запросом к БД."""
+        for url, etag in self.etags().items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(1):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+    def test_comment_changes_post_and_author_pages(self):
+        """Комментарий обновляет пост, профиль и группу автора."""
+        etags = self.etags()
+        Comment.objects.create(post=self.post, author=self.reader, text='Ок')
+        self.assertStatuses(etags, dict.fromkeys(etags, 200))
+
+    def test_follow_keeps_group_page(self):
+        """Подписка меняет страницы автора, но не страницу группы."""
+        post_url, profile_url, group_url = self.pages()
+        etags = self.etags()
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertStatuses(
+            etags, {post_url: 200, profile_url: 200, group_url: 304}
+        )
+
+    def test_group_rename_changes_all_pages(self):
+        """Новое название группы видно на всех страницах."""
+        etags = self.etags()
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertStatuses(etags, dict.fromkeys(etags, 200))
+
+    def test_evicted_scope_does_not_restore_old_etag(self):
+        """Вытесненная метка правки не возвращает ETag до правки."""
+        etags = self.etags()
+        self.post.text = 'Новый текст'
+        self.post.save()
+        cache.delete_many([
+            conditional.CHANGED_KEY % scope
+            for scope in (
+                'post:%s' % self.post.pk,
+                'user:%s' % self.author.pk,
+                'group:%s' % self.group.pk,
+            )
+        ])
+        self.assertStatuses(etags, dict.fromkeys(etags, 200))
+
+    def test_no_last_modified(self):
+        """Без ETag страница не отвечает 304 по одной дате."""
+        for url in self.pages():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn('Last-Modified', response)
+                response = self.client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 3600)
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """У другого пользователя своя шапка и кнопки — свой ETag."""
+        etags = self.etags()
+        client = Client()
+        client.force_login(self.reader)
+        self.assertStatuses(etags, dict.fromkeys(etags, 200), client)
+
+
+# Просмотры не сбрасываются в БД посреди подсчёта запросов.
+@override_settings(TRENDING_VIEW_FLUSH=60 * 60)
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        for number in range(settings.COMMENT_PAGE_COUNT * 2 + 5):
+            commenter = User.objects.create_user(username=f'reader{number}')
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_first_page_is_bounded(self):
+        """Страница поста показывает первую порцию комментариев."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), settings.COMMENT_PAGE_COUNT)
+        self.assertTrue(comments.has_next())
+        self.assertContains(
+            response, reverse('posts:comments', args=[self.post.pk])
+        )
+
+    def test_fragment_continues_from_cursor(self):
+        """Фрагмент отдаёт следующие порции до конца без повторов."""
+        page = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        ).context['comments']
+        seen = [comment.pk for comment in page]
+        while page.has_next():
+            response = self.client.get(
+                reverse('posts:comments', args=[self.post.pk]),
+                {'after': page.next_cursor},
+            )
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            page = response.context['comments']
+            seen.extend(comment.pk for comment in page)
+        expected = Comment.objects.order_by('-created', '-pk').values_list(
+            'pk', flat=True
+        )
+        self.assertEqual(seen, list(expected))
+
+    def test_fragment_for_missing_post(self):
+        """Для несуществующего поста фрагмент отвечает 404."""
+        response = self.client.get(reverse('posts:comments', args=[10 ** 6]))
+        self.assertEqual(response.status_code, 404)
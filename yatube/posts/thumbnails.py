@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import metrics
+from core.tasks import enqueue
+
+from .conditional import touch_post_by_id
+from .feed_cache import bump_generation
+from .models import Post
+
+# Пока задача в очереди, повторные промахи не ставят её ещё раз.
+PENDING_KEY = "posts:thumbnail-pending:%s"
+PENDING_TIMEOUT = 60
+
+
+def generate_thumbnails(post_id):
+    """Строит все миниатюры из POST_THUMBNAILS для картинки поста."""
+    cache.delete(PENDING_KEY % post_id)
+    post = Post.objects.filter(pk=post_id).only("image").first()
+    if post is None or not post.image:
+        return
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        get_thumbnail(post.image, geometry, **options)
+    # Ленты в кеше и страницы у браузеров ещё показывают оригинал.
+    bump_generation()
+    touch_post_by_id(post_id)
+
+
+def schedule_thumbnails(post_id):
+    if cache.add(PENDING_KEY % post_id, True, PENDING_TIMEOUT):
+        enqueue(generate_thumbnails, post_id)
+
+
+def _thumbnail_name(source, geometry, options):
+    # Повторяет расчёт имени из ThumbnailBackend.get_thumbnail, но без
+    # построения картинки: ключ нужен только для поиска в kvstore.
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault("format", backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def ready_thumbnail(image, name, post_id=None):
+    """Готовая миниатюра или None; на промахе ставит генерацию в очередь."""
+    if not image:
+        return None
+    geometry, options = settings.POST_THUMBNAILS[name]
+    source = ImageFile(image)
+    thumbnail = ImageFile(
+        _thumbnail_name(source, geometry, options), default.storage
+    )
+    cached = default.kvstore.get(thumbnail)
+    metrics.record_cache("thumbnail", cached is not None)
+    if cached is None and post_id is not None:
+        schedule_thumbnails(post_id)
+    return cached
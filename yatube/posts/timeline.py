@@ -0,0 +1,206 @@
+import heapq
+import itertools
+
+from django.conf import settings
+from django.db import connections, router
+
+from .bulk import batches, insert
+from .feed_cache import bump_generation
+from .models import Follow, Post, TimelineEntry
+from .pagination import CursorPaginator
+
+FAN_OUT_BATCH = 1000
+# Не больше 999 параметров в запросе: предел старых SQLite.
+TRIM_BATCH = 900
+
+
+def trim_timeline(user_id, depth=None):
+    """Обрезает ленту пользователя до TIMELINE_DEPTH последних постов."""
+    trim_timelines([user_id], depth)
+
+
+def _supports_window(connection):
+    # Django 2.2 не знает, что SQLite с 3.25 умеет оконные функции.
+    return connection.features.supports_over_clause or (
+        connection.vendor == "sqlite"
+        and connection.Database.sqlite_version_info >= (3, 25, 0)
+    )
+
+
+def trim_timelines(user_ids, depth=None):
+    """Обрезает ленты пользователей одним DELETE на TRIM_BATCH лент."""
+    depth = depth or settings.TIMELINE_DEPTH
+    using = router.db_for_write(TimelineEntry)
+    connection = connections[using]
+    if not _supports_window(connection):
+        for user_id in user_ids:
+            _trim_one(user_id, depth)
+        return
+    quote = connection.ops.quote_name
+    table = quote(TimelineEntry._meta.db_table)
+    pk = quote(TimelineEntry._meta.pk.column)
+    column = {
+        name: quote(TimelineEntry._meta.get_field(name).column)
+        for name in ("user", "pub_date", "post")
+    }
+    with connection.cursor() as cursor:
+        for batch in batches(user_ids, TRIM_BATCH):
+            # Вложенная выборка материализуется: так MySQL разрешает
+            # читать таблицу, из которой удаляем.
+            cursor.execute(
+                "DELETE FROM {table} WHERE {pk} IN (SELECT {pk} FROM ("
+                "SELECT {pk}, ROW_NUMBER() OVER (PARTITION BY {user} "
+                "ORDER BY {pub_date} DESC, {post} DESC) AS position "
+                "FROM {table} WHERE {user} IN ({users})"
+                ") ranked WHERE position > %s)".format(
+                    table=table,
+                    pk=pk,
+                    users=", ".join(["%s"] * len(batch)),
+                    **column,
+                ),
+                (*batch, depth),
+            )
+
+
+def _trim_one(user_id, depth):
+    boundary = (
+        TimelineEntry.objects.filter(user_id=user_id)
+        .order_by("-pub_date", "-post_id")
+        .values_list("pub_date", "post_id")[depth:depth + 1]
+    )
+    boundary = list(boundary)
+    if not boundary:
+        return
+    pub_date, post_id = boundary[0]
+    TimelineEntry.objects.filter(
+        user_id=user_id, pub_date__lte=pub_date
+    ).exclude(pub_date=pub_date, post_id__gt=post_id).delete()
+
+
+def fan_out_post(post_id):
+    """Раскладывает новый пост в ленты всех подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).values(
+        "author_id", "pub_date"
+    ).first()
+    if post is None:
+        return
+    followers = Follow.objects.filter(
+        author_id=post["author_id"]
+    ).values_list("user_id", flat=True)
+    batch = []
+    for user_id in followers.iterator(chunk_size=FAN_OUT_BATCH):
+        batch.append(user_id)
+        if len(batch) == FAN_OUT_BATCH:
+            _write_batch(batch, post_id, post)
+            batch = []
+    if batch:
+        _write_batch(batch, post_id, post)
+    bump_generation()
+
+
+def _write_batch(user_ids, post_id, post):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=post["author_id"],
+                pub_date=post["pub_date"],
+            )
+            for user_id in user_ids
+        ),
+        ignore_conflicts=True,
+    )
+    trim_timelines(user_ids)
+
+
+def backfill_timeline(user_id, author_id):
+    """Подкладывает в ленту свежие посты автора после подписки."""
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        "-pub_date"
+    ).values_list("pk", "pub_date")[:settings.TIMELINE_DEPTH]
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ),
+        ignore_conflicts=True,
+    )
+    trim_timeline(user_id)
+    bump_generation()
+
+
+def drop_author(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    bump_generation()
+
+
+def rebuild_timelines(batch_size=1000):
+    """Собирает все ленты слиянием свежих постов авторов из подписок.
+
+    Нужна после массовой загрузки, которая обходит сигналы. Последние
+    посты автора читаются один раз и переиспользуются для всех его
+    подписчиков.
+    """
+    depth = settings.TIMELINE_DEPTH
+    latest = {}
+
+    def latest_posts(author_id):
+        if author_id not in latest:
+            latest[author_id] = [
+                (pub_date, post_id, author_id)
+                for pub_date, post_id in Post.objects.filter(
+                    author_id=author_id
+                ).order_by("-pub_date", "-pk").values_list(
+                    "pub_date", "pk"
+                )[:depth]
+            ]
+        return latest[author_id]
+
+    follows = Follow.objects.order_by("user_id").values_list(
+        "user_id", "author_id"
+    )
+
+    def entries():
+        for user_id, pairs in itertools.groupby(
+            follows.iterator(chunk_size=batch_size), key=lambda pair: pair[0]
+        ):
+            merged = heapq.merge(
+                *(latest_posts(author_id) for _, author_id in pairs),
+                reverse=True,
+            )
+            for pub_date, post_id, author_id in itertools.islice(
+                merged, depth
+            ):
+                yield TimelineEntry(
+                    user_id=user_id,
+                    post_id=post_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+
+    created = insert(
+        TimelineEntry, entries(), batch_size, ignore_conflicts=True
+    )
+    bump_generation()
+    return created
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсор по ленте подписок: листает записи, отдаёт посты."""
+
+    def __init__(self, user, per_page):
+        entries = TimelineEntry.objects.filter(user=user)
+        super().__init__(entries, per_page, pk_field="post_id")
+
+    def fetch(self, queryset):
+        entries = queryset.select_related(
+            "post", "post__author", "post__group"
+        )
+        return [entry.post for entry in entries]
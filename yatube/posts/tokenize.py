@@ -0,0 +1,95 @@
+"""Разбиение текста постов на термы для поискового индекса.
+
+Русские слова приводятся к основе стеммером Snowball (Портер для
+русского языка), поэтому «котики», «котиков» и «котик» дают один терм.
+Модуль не зависит от моделей и используется в том числе в миграциях.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+MAX_TOKEN_LENGTH = 64
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+CYRILLIC_RE = re.compile(r"[а-я]")
+
+STOP_WORDS = frozenset(
+    "а без бы в во вот вы да для до его ее если есть еще же за и из или "
+    "им их к как ко когда кто ли мне мы на над не нет ни но ну о об он "
+    "она они оно от по под при с со так там то тоже только у уже чем что "
+    "это я a an and are as at be by for from in is it of on or that the "
+    "this to was with".split()
+)
+
+VOWELS = "аеиоуыэюя"
+RV_RE = re.compile(r"^(.*?[%s])(.*)$" % VOWELS)
+PERFECTIVE_GERUND_RE = re.compile(
+    r"((ив|ивши|ившись|ыв|ывши|ывшись)|((?<=[ая])(в|вши|вшись)))$"
+)
+REFLEXIVE_RE = re.compile(r"(с[яь])$")
+ADJECTIVE_RE = re.compile(
+    r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|"
+    r"ую|юю|ая|яя|ою|ею)$"
+)
+PARTICIPLE_RE = re.compile(r"((ивш|ывш|ующ)|((?<=[ая])(ем|нн|вш|ющ|щ)))$")
+VERB_RE = re.compile(
+    r"((ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|"
+    r"ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю)|((?<=[ая])(ла|на|ете|"
+    r"йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)))$"
+)
+NOUN_RE = re.compile(
+    r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|"
+    r"ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$"
+)
+DERIVATIONAL_RE = re.compile(r".*[^%s]+[%s].*ость?$" % (VOWELS, VOWELS))
+DERIVATIONAL_SUFFIX_RE = re.compile(r"ость?$")
+SUPERLATIVE_RE = re.compile(r"(ейше|ейш)$")
+
+
+def stem_russian(word):
+    """Основа русского слова по алгоритму Snowball."""
+    match = RV_RE.match(word)
+    if match is None:
+        return word
+    start, rv = match.groups()
+    stripped = PERFECTIVE_GERUND_RE.sub("", rv, 1)
+    if stripped == rv:
+        rv = REFLEXIVE_RE.sub("", rv, 1)
+        stripped = ADJECTIVE_RE.sub("", rv, 1)
+        if stripped != rv:
+            rv = PARTICIPLE_RE.sub("", stripped, 1)
+        else:
+            stripped = VERB_RE.sub("", rv, 1)
+            if stripped == rv:
+                rv = NOUN_RE.sub("", rv, 1)
+            else:
+                rv = stripped
+    else:
+        rv = stripped
+    if rv.endswith("и"):
+        rv = rv[:-1]
+    if DERIVATIONAL_RE.match(rv):
+        rv = DERIVATIONAL_SUFFIX_RE.sub("", rv, 1)
+    if rv.endswith("ь"):
+        rv = rv[:-1]
+    else:
+        rv = SUPERLATIVE_RE.sub("", rv, 1)
+        if rv.endswith("нн"):
+            rv = rv[:-1]
+    return start + rv
+
+
+@lru_cache(maxsize=65536)
+def normalize(word):
+    word = word.lower().replace("ё", "е")
+    if word in STOP_WORDS:
+        return None
+    if CYRILLIC_RE.search(word):
+        word = stem_russian(word)
+    return word[:MAX_TOKEN_LENGTH] or None
+
+
+def tokenize(text):
+    """Счётчик термов текста: {основа: сколько раз встретилась}."""
+    terms = (normalize(word) for word in WORD_RE.findall(text or ""))
+    return Counter(term for term in terms if term)
@@ -0,0 +1,248 @@
+"""Популярные посты: счёт, затухающий со временем.
+
+Событие весом w в момент t добавляет к счёту поста w·2^(-(now - t)/T),
+где T — TRENDING_HALF_LIFE. Множитель 2^(-now/T) общий для всех постов
+и на порядок не влияет, поэтому в Post.trend_score хранится
+ln Σ w·2^((t - EPOCH)/T). Такой счёт не переполняется, не требует
+периодического пересчёта всей таблицы, а каждое событие прибавляется
+к нему одним UPDATE через logaddexp прямо в SQL. Индекс по trend_score
+отдаёт лучшие посты в порядке текущего, уже затухшего счёта.
+
+Просмотры копятся в памяти процесса. Первый просмотр пачки заводит
+таймер на TRENDING_VIEW_FLUSH секунд, по нему пачка уходит в БД фоновой
+задачей; остаток сбрасывается при выходе процесса. При
+TASKS_ALWAYS_EAGER таймера нет: пачка пишется в запросе, пришедшем
+после срока. Подписка засчитывается один раз на пару читатель–автор.
+"""
+import atexit
+import functools
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models import F, FloatField, Subquery, Value
+from django.db.models.functions import Abs, Exp, Greatest, Ln
+from django.utils import timezone
+
+from core.tasks import enqueue
+
+from .models import Comment, CreditedFollow, Post
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(2021, 1, 1, tzinfo=timezone.utc)
+
+_views = Counter()
+_views_lock = threading.Lock()
+_views_flushed = time.monotonic()
+_flush_timer = None
+
+
+def event_score(kind, when, count=1):
+    """Вклад count событий kind в момент when в логарифмической шкале."""
+    rate = math.log(2) / settings.TRENDING_HALF_LIFE
+    weight = settings.TRENDING_WEIGHTS[kind] * count
+    return math.log(weight) + (when - EPOCH).total_seconds() * rate
+
+
+def logaddexp(first, second):
+    """ln(e^first + e^second) без переполнения."""
+    high, low = max(first, second), min(first, second)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _added(score):
+    """Выражение trend_score ⊕ score для UPDATE, без чтения строки."""
+    score = Value(score, output_field=FloatField())
+    current = F("trend_score")
+    return Greatest(current, score) + Ln(
+        Value(1.0) + Exp(-Abs(current - score))
+    )
+
+
+def _update_sql(connection, expression):
+    """UPDATE счёта по id; SET собирается из expression над колонкой."""
+    quote = connection.ops.quote_name
+    column = quote(Post._meta.get_field("trend_score").column)
+    return "UPDATE %s SET %s = %s WHERE %s = %%s" % (
+        quote(Post._meta.db_table),
+        column,
+        expression.format(column=column),
+        quote(Post._meta.pk.column),
+    )
+
+
+def _execute_many(sql, rows):
+    using = router.db_for_write(Post)
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.executemany(sql(connections[using]), rows)
+
+
+def _added_sql(connection):
+    # То же, что _added, но SQL строится один раз на пачку: сборка
+    # выражения ORM на каждое событие стоила в 30 раз дороже UPDATE.
+    greatest = "MAX" if connection.vendor == "sqlite" else "GREATEST"
+    return _update_sql(
+        connection,
+        greatest + "({column}, %s) + LN(1.0 + EXP(-ABS({column} - %s)))",
+    )
+
+
+def _assigned_sql(connection):
+    return _update_sql(connection, "%s")
+
+
+def add_events(events):
+    """Прибавляет события (post_id, kind, when, count) к счёту постов.
+
+    События одного поста складываются заранее: один UPDATE на пост.
+    Возвращает число затронутых постов.
+    """
+    deltas = {}
+    for post_id, kind, when, count in events:
+        score = event_score(kind, when, count)
+        if post_id in deltas:
+            score = logaddexp(deltas[post_id], score)
+        deltas[post_id] = score
+    _execute_many(
+        _added_sql,
+        [(score, score, post_id) for post_id, score in deltas.items()],
+    )
+    return len(deltas)
+
+
+def record(post_id, kind, when=None):
+    add_events([(post_id, kind, when or timezone.now(), 1)])
+
+
+def record_for_author(author_id, kind, when=None):
+    """Засчитывает событие автора (подписку) его последнему посту."""
+    when = when or timezone.now()
+    latest = Post.objects.filter(author_id=author_id).order_by(
+        "-pub_date", "-pk"
+    ).values("pk")[:1]
+    Post.objects.filter(pk=Subquery(latest)).update(
+        trend_score=_added(event_score(kind, when))
+    )
+
+
+def record_follow(user_id, author_id, when=None):
+    """Засчитывает подписку, если эта пара ещё не засчитана.
+
+    Иначе цикл подписки и отписки накручивал бы счёт без предела.
+    """
+    try:
+        with transaction.atomic(using=router.db_for_write(CreditedFollow)):
+            CreditedFollow.objects.create(user_id=user_id, author_id=author_id)
+    except IntegrityError:
+        return
+    record_for_author(author_id, "follow", when)
+
+
+def record_view(post_id):
+    """Учитывает просмотр; в БД просмотры уходят пачкой."""
+    global _views_flushed, _flush_timer
+    with _views_lock:
+        _views[post_id] += 1
+        if not settings.TASKS_ALWAYS_EAGER:
+            if _flush_timer is None:
+                _flush_timer = threading.Timer(
+                    settings.TRENDING_VIEW_FLUSH, _flush_on_timer
+                )
+                _flush_timer.daemon = True
+                _flush_timer.start()
+            return
+        now = time.monotonic()
+        due = now - _views_flushed >= settings.TRENDING_VIEW_FLUSH
+        if due:
+            _views_flushed = now
+    if due:
+        enqueue(flush_views)
+
+
+def counts_views(view):
+    """Засчитывает просмотр и при ответе 304.
+
+    Ставится поверх post_condition, который отвечает 304, не вызывая
+    представление.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if request.method == "GET" and response.status_code in (200, 304):
+            record_view(kwargs["post_id"])
+        return response
+
+    return wrapper
+
+
+def _flush_on_timer():
+    global _flush_timer
+    with _views_lock:
+        _flush_timer = None
+    enqueue(flush_views)
+
+
+@atexit.register
+def _flush_at_exit():
+    with _views_lock:
+        if _flush_timer is None:
+            return
+        _flush_timer.cancel()
+    try:
+        flush_views()
+    except Exception:
+        logger.exception("Просмотры не сброшены при выходе")
+
+
+def flush_views():
+    global _flush_timer
+    with _views_lock:
+        views = dict(_views)
+        _views.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+    if not views:
+        return 0
+    now = timezone.now()
+    return add_events(
+        (post_id, "view", now, count) for post_id, count in views.items()
+    )
+
+
+def rebuild_trending_scores(first_pk, last_pk):
+    """Пересчитывает счёт постов диапазона по дате и комментариям.
+
+    Подписки и просмотры не хранят времени, их вклад при пересчёте
+    теряется: нужен только после смены весов или периода полураспада.
+    """
+    posts = Post.objects.filter(pk__gte=first_pk, pk__lte=last_pk)
+    scores = {
+        pk: event_score("post", pub_date)
+        for pk, pub_date in posts.values_list("pk", "pub_date")
+    }
+    comments = Comment.objects.filter(
+        post_id__gte=first_pk, post_id__lte=last_pk
+    ).values_list("post_id", "created")
+    for post_id, created in comments.iterator():
+        if post_id in scores:
+            scores[post_id] = logaddexp(
+                scores[post_id], event_score("comment", created)
+            )
+    # bulk_update строит CASE на всю пачку, что на SQLite квадратично.
+    _execute_many(
+        _assigned_sql, [(score, pk) for pk, score in scores.items()]
+    )
+    return len(scores)
+
+
+def top_posts(limit):
+    """Лучшие посты по счёту — один проход по индексу."""
+    return Post.objects.for_feed().order_by("-trend_score", "-pk")[:limit]
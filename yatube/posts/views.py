@@ -1,41 +1,64 @@
-from django.core.paginator import Paginator
+from django.http import Http404
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
 
-from yatube.settings import PAGE_COUNT
+from yatube.settings import COMMENT_PAGE_COUNT, GROUP_PAGE_COUNT, PAGE_COUNT
 
-from .models import Group, Post, User, Follow
-from .forms import PostForm, CommentForm
+from .conditional import group_condition, post_condition, profile_condition
+from .models import Comment, Group, GroupStats, Post, User, Follow
+from .counters import stats_for
+from .forms import CommentForm, PostForm, SearchForm
+from .pagination import CursorPaginator, get_cursor_page, paginate
+from .relationships import follow_state
+from .search import SearchPaginator, search_posts
+from .timeline import TimelinePaginator
+from .trending import counts_views
 
 
-from django.core.paginator import Paginator
-from django.shortcuts import get_object_or_404, render, redirect
-from django.contrib.auth.decorators import login_required
+def index(request):
+    template = "posts/index.html"
+    posts = Post.objects.for_feed()
+    page_obj = paginate(request, posts)
+    context = {
+        "page_obj": page_obj,
+    }
+    return render(request, template, context)
 
-from yatube.settings import PAGE_COUNT
 
-from .models import Group, Post, User
+def group_index(request):
+    # Сводка берётся из таблицы, которую пересчитывает
+    # refresh_group_stats; страница — один запрос по индексу.
+    paginator = CursorPaginator(
+        GroupStats.objects.select_related("group"),
+        GROUP_PAGE_COUNT,
+        key_field="posts_count",
+    )
+    context = {
+        "page_obj": get_cursor_page(request, paginator),
+    }
+    return render(request, "posts/group_index.html", context)
 
 
-def index(request):
-    template = "posts/index.html"
-    posts = Post.objects.all()
-    paginator = Paginator(posts, PAGE_COUNT)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+def popular(request):
+    paginator = CursorPaginator(
+        Post.objects.for_feed(), PAGE_COUNT, key_field="trend_score"
+    )
+    page_obj = get_cursor_page(request, paginator)
+    # Подписки на авторов страницы — одним запросом для всех кнопок.
+    follow_state(request).following(post.author_id for post in page_obj)
     context = {
         "page_obj": page_obj,
+        "popular": True,
     }
-    return render(request, template, context)
+    return render(request, "posts/popular.html", context)
 
 
+@group_condition
 def group_posts(request, slug):
     template = "posts/group_list.html"
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, PAGE_COUNT)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    page_obj = paginate(request, posts)
     context = {
         "group": group,
         "page_obj": page_obj,
@@ -43,37 +66,32 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@profile_condition
 def profile(request, username):
     template = "posts/profile.html"
     post = get_object_or_404(User, username=username)
-    posts = post.posts.all()
-    paginator = Paginator(posts, PAGE_COUNT)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
-    following = post.following.all()
-    following = False
-    authors = list()
-    for writer in following:
-        author = writer.user
-        authors.append(author)
-    if request.user in authors:
-        following = True
+    posts = post.posts.for_feed()
+    page_obj = paginate(request, posts)
+    following = follow_state(request).is_following(post.pk)
+    stats = stats_for(post.pk)
     context = {
         "post": post,
         "page_obj": page_obj,
-        "number_of_posts": posts.count(),
+        "stats": stats,
+        "number_of_posts": stats.posts_count,
         "following": following,
     }
     return render(request, template, context)
 
 
+@counts_views
+@post_condition
 def post_detail(request, post_id):
     template = "posts/post_detail.html"
-    post_detail = get_object_or_404(Post, pk=post_id)
-    author = post_detail.author
-    number_of_posts = author.posts.all().count()
+    post_detail = get_object_or_404(Post.objects.for_feed(), pk=post_id)
+    number_of_posts = stats_for(post_detail.author_id).posts_count
     form = CommentForm(request.POST or None)
-    comments = post_detail.comments.all()
+    comments = comments_page(request, post_detail.pk)
     context = {
         "post_detail": post_detail,
         "number_of_posts": number_of_posts,
@@ -83,6 +101,28 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def comments_page(request, post_id):
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related("author"),
+        COMMENT_PAGE_COUNT,
+        key_field="created",
+    )
+    return paginator.get_page(after=request.GET.get("after"))
+
+
+@post_condition
+def post_comments(request, post_id):
+    """Следующая порция комментариев HTML-фрагментом."""
+    page = comments_page(request, post_id)
+    if not page and not Post.objects.filter(pk=post_id).exists():
+        raise Http404
+    context = {
+        "comments": page,
+        "post_id": post_id,
+    }
+    return render(request, "posts/includes/comments.html", context)
+
+
 @login_required
 def post_create(request):
     if request.method != "POST":
@@ -127,22 +167,33 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    user = request.user
-    followings = user.follower.all()
-    authors = list()
-    for user in followings:
-        author = user.author
-        authors.append(author)
-    post_list = Post.objects.filter(author__in=authors)
-    paginator = Paginator(post_list, PAGE_COUNT)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    paginator = TimelinePaginator(request.user, PAGE_COUNT)
+    page_obj = get_cursor_page(request, paginator)
     context = {
         "page_obj": page_obj,
     }
     return render(request, "posts/follow.html", context)
 
 
+def search(request):
+    form = SearchForm(request.GET or None)
+    page_obj = None
+    if form.is_valid():
+        rows = search_posts(
+            form.cleaned_data["q"],
+            group=form.cleaned_data["group"],
+            author=form.cleaned_data["author"],
+        )
+        paginator = SearchPaginator(rows, PAGE_COUNT)
+        page_obj = get_cursor_page(request, paginator)
+    context = {
+        "form": form,
+        "page_obj": page_obj,
+        "page_query": form.query_string(),
+    }
+    return render(request, "posts/search.html", context)
+
+
 @login_required
 def profile_follow(request, username):
     post_author = get_object_or_404(User, username=username)
@@ -0,0 +1,24 @@
+// Подгружает следующую порцию комментариев вместо перехода по ссылке.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('.comments-more a[data-fragment]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  var more = link.parentNode;
+  link.classList.add('disabled');
+  fetch(link.dataset.fragment, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.statusText);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      more.insertAdjacentHTML('beforebegin', html);
+      more.remove();
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
@@ -49,6 +49,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,12 +64,24 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# В продакшене скомпилированные шаблоны живут в памяти воркера, и wsgi.py
+# прогревает их до первого запроса. При DEBUG кеш выключен, чтобы правки
+# шаблонов были видны без перезапуска; YATUBE_TEMPLATE_CACHE=1 или 0
+# включает или выключает его явно.
+if os.environ.get('YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1') == '1':
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.MetricsDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -84,13 +99,63 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+
+def sqlite_database(name, **extra):
+    return {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'NAME': os.path.join(BASE_DIR, name),
+        # Соединение живёт между запросами потока, а не открывается
+        # заново на каждый; 0 возвращает старое поведение.
+        'CONN_MAX_AGE': int(os.environ.get('YATUBE_CONN_MAX_AGE', 600)),
+        # Ожидание блокировки в секундах на уровне драйвера sqlite3.
+        'OPTIONS': {'timeout': 5},
+        **extra,
     }
+
+
+DATABASES = {
+    'default': sqlite_database('db.sqlite3'),
 }
 
+# Применяются к каждому новому соединению SQLite (core.db).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
+    # Отрицательное значение — размер в КиБ, а не число страниц.
+    'cache_size': -64 * 1024,
+}
+# Проверять постоянные соединения перед каждым запросом.
+DATABASE_HEALTH_CHECKS = True
+
+# Локальные реплики — копии db.sqlite3, которые обновляет
+# manage.py sync_replicas. Их число задаёт YATUBE_SQLITE_REPLICAS.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('YATUBE_SQLITE_REPLICAS', 0)) + 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = sqlite_database(
+        f'db.{alias}.sqlite3', TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Страницы, которые читают с реплик, и окно после своей записи, когда
+# клиент читает только с основной БД.
+REPLICA_VIEWS = [
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:comments',
+    'posts:follow_index',
+    'posts:group_index',
+    'posts:popular',
+]
+REPLICA_STICKY_COOKIE = 'primary_pin'
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -110,6 +175,17 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Пользователь сессии берётся из кеша (core.auth) на USER_CACHE_TIMEOUT
+# секунд; сохранение пользователя сбрасывает кеш.
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+USER_CACHE_TIMEOUT = 60
+
+# Сессии в кеше (core.sessions). Срок продлевается на каждом запросе,
+# но в БД попадает не чаще раза в SESSION_EXPIRY_REFRESH секунд.
+SESSION_ENGINE = 'core.sessions'
+SESSION_SAVE_EVERY_REQUEST = True
+SESSION_EXPIRY_REFRESH = 60 * 5
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/2.2/topics/i18n/
@@ -130,6 +206,15 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.environ.get(
+    'YATUBE_STATIC_ROOT', os.path.join(BASE_DIR, 'staticfiles')
+)
+# collectstatic добавляет хеш содержимого к именам и сжатые копии .gz
+# (core.staticfiles), StaticFilesMiddleware отдаёт их из STATIC_ROOT.
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStorage'
+# Файлы с хешем в имени не меняются никогда, остальные — после сборки.
+STATIC_IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+STATIC_MAX_AGE = 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -138,14 +223,105 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGE_COUNT = 10
+COMMENT_PAGE_COUNT = 20
+GROUP_PAGE_COUNT = 50
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
+# Кто отправляет байты медиафайлов (core.media): None — сам воркер
+# через sendfile, 'x-accel-redirect' — nginx из внутреннего location
+# MEDIA_ACCEL_PREFIX с alias на MEDIA_ROOT, 'x-sendfile' — Apache.
+MEDIA_ACCEL = os.environ.get('YATUBE_MEDIA_ACCEL') or None
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+MEDIA_MAX_AGE = 60 * 60 * 24
+
+# Двухуровневый кеш (core.cache): LRU в памяти процесса перед общим
+# кешем 'shared'. Общим между воркерами он становится, если задать
+# каталог YATUBE_CACHE_DIR; без него L2 живёт в памяти процесса.
+# Журнал инвалидаций лежит в отдельном 'invalidations': его записи не
+# вытесняют данные, а он вмещает LOG_SIZE записей с запасом.
+CACHE_MAX_ENTRIES = 10_000
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {
+            'MAX_ENTRIES': CACHE_MAX_ENTRIES,
+            'MAX_BYTES': 32 * 1024 * 1024,
+            'L1_TIMEOUT': 10,
+            'SYNC_INTERVAL': 0.5,
+            'LOG_CACHE': 'invalidations',
+            'LOG_SIZE': 1000,
+            'LOG_TIMEOUT': 60,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'MAX_ENTRIES': CACHE_MAX_ENTRIES},
+    },
+    'invalidations': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'invalidations',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+if os.environ.get('YATUBE_CACHE_DIR'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['YATUBE_CACHE_DIR'],
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    }
+    CACHES['invalidations'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(
+            os.environ['YATUBE_CACHE_DIR'], 'invalidations'
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 2000},
     }
+
+# Фоновые задачи: в режиме разработки выполняются сразу, без пула.
+TASKS_ALWAYS_EAGER = DEBUG
+TASK_WORKERS = 4
+
+# Сколько последних постов хранится в ленте подписок каждого пользователя.
+TIMELINE_DEPTH = 500
+
+# Фрагменты лент сбрасываются по поколению, таймаут лишь страховка.
+FEED_CACHE_TIMEOUT = 60 * 10
+
+# Активный автор группы писал в неё за последние столько дней. Сводку
+# каталога групп пересчитывает refresh_group_stats, запускаемый по cron.
+GROUP_ACTIVE_DAYS = 30
+
+# Популярное (posts.trending): вклад события в счёт поста убывает вдвое
+# за TRENDING_HALF_LIFE секунд. Просмотры копятся в памяти воркера и
+# пишутся в БД пачкой через TRENDING_VIEW_FLUSH секунд после первого.
+TRENDING_HALF_LIFE = 60 * 60 * 12
+TRENDING_WEIGHTS = {
+    'post': 1.0,
+    'comment': 3.0,
+    'follow': 5.0,
+    'view': 0.2,
+}
+TRENDING_VIEW_FLUSH = 5
+
+INTERNAL_IPS = ['127.0.0.1']
+
+# /metrics/ открыт персоналу, запросам с заголовком
+# «Authorization: Bearer <METRICS_TOKEN>» и адресам из METRICS_ALLOWED_IPS.
+# За прокси REMOTE_ADDR у всех запросов один, поэтому по умолчанию
+# список пуст, а для Prometheus задаётся токен.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN') or None
+METRICS_ALLOWED_IPS = []
+
+# Каталог для снимков метрик воркеров; None — только текущий процесс.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 5
+
+# Миниатюры картинок постов, которые строятся сразу после загрузки.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
 }
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# YATUBE_WARM_UP=0 отключает прогрев, например для замера холодного старта.
+if os.environ.get('YATUBE_WARM_UP', '1') == '1':
+    from core.warmup import warm_up
+
+    warm_up()